@@ -0,0 +1,93 @@
+import os
+import zipfile
+from collections import Counter
+
+from image_probe import IMAGE_EXTENSIONS, model_number_of
+
+MODEL_EXTENSIONS = (".max", ".fbx", ".obj", ".3ds")
+
+
+def list_members(path):
+    """(name, size) of the files in an archive, or None when the format is unsupported
+
+    Zip archives only have their central directory read. 7z and rar listings
+    need the optional py7zr and rarfile packages.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".zip":
+        with zipfile.ZipFile(path) as archive:
+            return [
+                (i.filename, i.file_size) for i in archive.infolist() if not i.is_dir()
+            ]
+    if ext == ".7z":
+        try:
+            import py7zr
+        except ImportError:
+            return None
+        with py7zr.SevenZipFile(path) as archive:
+            return [
+                (i.filename, i.uncompressed or 0)
+                for i in archive.list()
+                if not i.is_directory
+            ]
+    if ext == ".rar":
+        try:
+            import rarfile
+        except ImportError:
+            return None
+        with rarfile.RarFile(path) as archive:
+            return [
+                (i.filename, i.file_size) for i in archive.infolist() if not i.is_dir()
+            ]
+    return None
+
+
+def read_member(path, name, max_bytes):
+    """Read a single member without extracting the archive, None if it is too large"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".zip":
+        with zipfile.ZipFile(path) as archive:
+            if archive.getinfo(name).file_size > max_bytes:
+                return None
+            return archive.read(name)
+    if ext == ".7z":
+        import py7zr
+
+        with py7zr.SevenZipFile(path) as archive:
+            data = archive.read([name])[name].read()
+    else:  # .rar
+        import rarfile
+
+        with rarfile.RarFile(path) as archive:
+            data = archive.read(name)
+    return data if len(data) <= max_bytes else None
+
+
+def infer_file_id(members, extract_file_id):
+    """Most likely 3dsky file ID from member names, model files weigh the most"""
+    votes = Counter()
+    for name, _ in members:
+        parts = name.replace("\\", "/").split("/")
+        for folder in parts[:-1]:
+            # Folders have no extension, give them one so the ID keeps its hash part
+            file_id = extract_file_id(folder + ".dir")
+            if file_id:
+                votes[file_id] += 1
+        file_id = extract_file_id(parts[-1])
+        if file_id:
+            votes[file_id] += 3 if parts[-1].lower().endswith(MODEL_EXTENSIONS) else 1
+    if not votes:
+        return None
+    return votes.most_common(1)[0][0]
+
+
+def find_preview(members, file_id):
+    """Name of the largest image member belonging to the model, or None"""
+    model_number = model_number_of(file_id)
+    images = [
+        (size, name)
+        for name, size in members
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+        and model_number_of(os.path.basename(name)) == model_number
+    ]
+    return max(images)[1] if images else None
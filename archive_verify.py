@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from throttle import RateLimiter
+
+
+class PacedReader:
+    """Read-only file whose reads are paced to a byte rate"""
+
+    def __init__(self, f, bytes_per_sec):
+        self.f = f
+        self.limiter = RateLimiter(bytes_per_sec)
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        if data:
+            self.limiter.acquire(len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.f.close()
+
+
+def open_archive(path, bytes_per_sec=None):
+    f = open(path, "rb")
+    return PacedReader(f, bytes_per_sec) if bytes_per_sec else f
+
+
+def verify_archive(path, bytes_per_sec=None):
+    """Check every member CRC of an archive, runs in a worker process
+
+    Returns (ok, message). Formats without an installed reader count as ok.
+    Zip and 7z reads are paced to bytes_per_sec; rarfile reads by path.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == ".zip":
+            import zipfile
+
+            with open_archive(path, bytes_per_sec) as f, zipfile.ZipFile(f) as archive:
+                bad_member = archive.testzip()
+            if bad_member:
+                return False, f"CRC mismatch in {bad_member}"
+        elif ext == ".7z":
+            try:
+                import py7zr
+            except ImportError:
+                return True, "not verified, py7zr is not installed"
+            with open_archive(path, bytes_per_sec) as f:
+                with py7zr.SevenZipFile(f) as archive:
+                    if archive.testzip():
+                        return False, "CRC mismatch"
+        elif ext == ".rar":
+            try:
+                import rarfile
+            except ImportError:
+                return True, "not verified, rarfile is not installed"
+            with rarfile.RarFile(path) as archive:
+                archive.testrar()
+    except Exception as e:
+        return False, f"{type(e).__name__}: {str(e)}"
+    return True, ""
+
+
+class ArchiveVerifier:
+    """Verify archives in a process pool ahead of the workers that move them
+
+    Archives are submitted in processing order. With bytes_per_sec, the rate
+    is split between the worker processes, which pace their own reads so
+    verification doesn't starve the moves. Results are cached by (device,
+    inode, size, mtime) for max_age seconds, so archives are only tested once.
+    """
+
+    cache_name = "archive_verify_cache.json"
+
+    def __init__(
+        self, cache_dir, processes=None, bytes_per_sec=None, max_age=30 * 24 * 3600
+    ):
+        self.cache_path = os.path.join(cache_dir, self.cache_name)
+        self.processes = processes or os.cpu_count() or 1
+        self.bytes_per_sec = bytes_per_sec
+        self.max_age = max_age
+        # "dev:inode" -> [size, mtime_ns, ok, message, checked]
+        self.cache = {}
+        self.cache_lock = threading.Lock()
+        self.results = {}  # path -> Future of (ok, message)
+        self.jobs = []  # Futures of archives handed to the pool
+        self.executor = None
+
+    def start(self, paths):
+        """Queue archives for verification, in the order they will be needed"""
+        from concurrent.futures import ProcessPoolExecutor
+
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                self.cache = self._unexpired(json.load(f))
+        except (OSError, ValueError):
+            self.cache = {}
+
+        pending = []
+        for path in paths:
+            future = Future()
+            self.results[path] = future
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                future.set_result((False, str(e)))
+                continue
+            key = f"{stat.st_dev}:{stat.st_ino}"
+            cached = self.cache.get(key)
+            if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                future.set_result((cached[2], cached[3]))
+            else:
+                pending.append((path, key, stat, future))
+
+        if pending:
+            processes = min(self.processes, len(pending))
+            bytes_per_sec = (
+                self.bytes_per_sec / processes if self.bytes_per_sec else None
+            )
+            self.executor = ProcessPoolExecutor(max_workers=processes)
+            for path, key, stat, future in pending:
+                job = self.executor.submit(verify_archive, path, bytes_per_sec)
+                self.jobs.append(job)
+                job.add_done_callback(
+                    lambda job, key=key, stat=stat, future=future: self._done(
+                        job, key, stat, future
+                    )
+                )
+        return self
+
+    def _unexpired(self, cache):
+        cutoff = time.time() - self.max_age
+        return {
+            key: entry
+            for key, entry in cache.items()
+            if len(entry) == 5 and entry[4] >= cutoff
+        }
+
+    def _done(self, job, key, stat, future):
+        if job.cancelled():
+            future.set_result((True, "not verified, verification stopped"))
+            return
+        try:
+            ok, message = job.result()
+        except Exception as e:
+            future.set_result((False, str(e)))
+            return
+        with self.cache_lock:
+            self.cache[key] = [stat.st_size, stat.st_mtime_ns, ok, message, time.time()]
+        future.set_result((ok, message))
+
+    def result(self, path):
+        """Wait for the verification of a queued archive, returns (ok, message)"""
+        future = self.results.get(path)
+        if future is None:
+            return True, "not queued"
+        return future.result()
+
+    def close(self):
+        """Stop verifying, collect what the pool verified and save the result cache
+
+        Archives the pool hasn't started are cancelled and reported as not
+        verified, so closing after an interrupted batch doesn't wait for the
+        whole queue. Expired cache entries are dropped.
+        """
+        from concurrent.futures import wait
+
+        for job in self.jobs:
+            job.cancel()
+        wait(self.jobs)
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        with self.cache_lock:
+            cache = self._unexpired(self.cache)
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(temp_path, self.cache_path)
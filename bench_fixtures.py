@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CATEGORIES = {
+    "Furniture": ["Chair", "Table", "Sofa", "Bed", "Wardrobe"],
+    "Lighting": ["Ceiling light", "Floor lamp", "Wall light"],
+    "Decoration": ["Vase", "Frame", "Plant", "Mirror"],
+    "Bathroom": ["Bathtub", "Sink", "Faucet"],
+    "Kitchen": ["Appliance", "Sink", "Cabinet"],
+}
+
+
+def model_id(number):
+    """Synthetic 3DSky file ID like 123456.5f3a2b1c"""
+    digest = hashlib.md5(str(number).encode()).hexdigest()[:12]
+    return f"{number}.{digest}"
+
+
+def model_categories(number):
+    parents = sorted(CATEGORIES)
+    parent = parents[number % len(parents)]
+    children = CATEGORIES[parent]
+    return parent, children[(number // len(parents)) % len(children)]
+
+
+_png_cache = {}
+
+
+def make_png(width, height, shade=128):
+    """Minimal solid color PNG, cached per size"""
+    key = (width, height, shade)
+    if key not in _png_cache:
+
+        def chunk(kind, data):
+            body = kind + data
+            return (
+                struct.pack(">I", len(data))
+                + body
+                + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+            )
+
+        row = b"\x00" + bytes([shade, shade // 2, 255 - shade]) * width
+        _png_cache[key] = (
+            b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(row * height, 1))
+            + chunk(b"IEND", b"")
+        )
+    return _png_cache[key]
+
+
+def make_archive(path, size, rng):
+    """Zip archive holding a single .max member of roughly the given size"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr(f"{name}.max", rng.randbytes(size))
+
+
+class LibraryGenerator:
+    """Builds synthetic source trees for each processing mode"""
+
+    def __init__(
+        self,
+        files=100,
+        archive_size=64 * 1024,
+        image_ratio=0.5,
+        duplicate_ratio=0.2,
+        invalid_ratio=0.02,
+        depth=2,
+        seed=0,
+    ):
+        self.files = files
+        self.archive_size = archive_size
+        self.image_ratio = image_ratio
+        self.duplicate_ratio = duplicate_ratio
+        self.invalid_ratio = invalid_ratio
+        self.depth = depth
+        self.seed = seed
+
+    def numbers(self):
+        return range(100000, 100000 + self.files)
+
+    def flat_source(self, directory):
+        """<num>.<hex>.zip archives with matching images and a few invalid names"""
+        rng = random.Random(self.seed)
+        os.makedirs(directory, exist_ok=True)
+        for number in self.numbers():
+            file_id = model_id(number)
+            if rng.random() < self.invalid_ratio:
+                file_id = f"model_{number}"
+            make_archive(
+                os.path.join(directory, f"{file_id}.zip"), self.archive_size, rng
+            )
+            if rng.random() < self.image_ratio:
+                with open(os.path.join(directory, f"{number}.jpg"), "wb") as f:
+                    f.write(make_png(320, 240))
+
+    def duplicate_source(self, directory):
+        """Archives with `(N)` copies of varying sizes, as left by browsers"""
+        rng = random.Random(self.seed)
+        os.makedirs(directory, exist_ok=True)
+        for number in self.numbers():
+            file_id = model_id(number)
+            make_archive(
+                os.path.join(directory, f"{file_id}.zip"), self.archive_size, rng
+            )
+            if rng.random() < self.duplicate_ratio:
+                for copy in range(1, rng.randint(2, 4)):
+                    size = self.archive_size + rng.choice([0, 0, 1024])
+                    make_archive(
+                        os.path.join(directory, f"{file_id} ({copy}).zip"), size, rng
+                    )
+
+    def organized_tree(self, models_root, offset=0):
+        """Pre-organized 3ds_models tree nested `depth` category levels deep"""
+        rng = random.Random(self.seed + offset)
+        for number in self.numbers():
+            number += offset
+            parent, child = model_categories(number)
+            folder = os.path.join(models_root, parent, child)
+            for level in range(2, self.depth):
+                folder = os.path.join(folder, f"Level {level} {number % 3}")
+            os.makedirs(folder, exist_ok=True)
+            file_id = model_id(number)
+            make_archive(os.path.join(folder, f"{file_id}.zip"), self.archive_size, rng)
+            if rng.random() < self.image_ratio:
+                with open(os.path.join(folder, f"{file_id}.jpeg"), "wb") as f:
+                    f.write(make_png(320, 240))
+
+
+class FakeSkyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fault(self, kind):
+        """Apply configured latency and return a fault status, or None"""
+        server = self.server
+        server.count(kind)
+        if server.latency:
+            time.sleep(server.latency)
+        roll = server.roll()
+        if roll < server.throttle_rate:
+            server.count("throttled")
+            return 429
+        if roll < server.throttle_rate + server.error_rate:
+            server.count("errors")
+            return 500
+        return None
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            query = json.loads(self.rfile.read(length)).get("query", "")
+        except ValueError:
+            query = ""
+
+        status = self._fault("api")
+        if status:
+            self._send(status, b"{}", headers={"Retry-After": "1"})
+            return
+
+        number = query.split(".")[0]
+        models = []
+        if number.isdigit() and self.server.roll() >= self.server.not_found_rate:
+            parent, child = model_categories(int(number))
+            models.append(
+                {
+                    "title_en": f"Model {number}",
+                    "category_parent": {"title_en": parent},
+                    "category": {"title_en": child},
+                    "images": [
+                        {"file_name": f"{number}.jpeg", "web_path": f"{number}.png"}
+                    ],
+                }
+            )
+        self._send(200, json.dumps({"data": {"models": models}}).encode())
+
+    def do_GET(self):
+        status = self._fault("images")
+        if status:
+            self._send(status, b"", "image/png")
+            return
+        width, height = self.server.image_size
+        body = make_png(width, height)
+        etag = f'"{width}x{height}-{len(body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.server.count("not_modified")
+            self._send(304, b"", "image/png", {"ETag": etag})
+            return
+        match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        if match and self.headers.get("If-Range") == etag:
+            start = int(match.group(1))
+            self.server.count("resumed")
+            self._send(
+                206,
+                body[start:],
+                "image/png",
+                {
+                    "ETag": etag,
+                    "Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}",
+                },
+            )
+            return
+        self._send(200, body, "image/png", {"ETag": etag})
+
+
+class FakeSkyServer(ThreadingHTTPServer):
+    """Local stand-in for the 3dsky API and image CDN"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        latency=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        not_found_rate=0.0,
+        image_size=(800, 600),
+        seed=0,
+    ):
+        super().__init__(("127.0.0.1", 0), FakeSkyHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.not_found_rate = not_found_rate
+        self.image_size = image_size
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def roll(self):
+        with self.lock:
+            return self.rng.random()
+
+    def count(self, kind):
+        with self.lock:
+            self.stats[kind] = self.stats.get(kind, 0) + 1
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.serve_forever, name="FakeSkyServer", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
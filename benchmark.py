@@ -0,0 +1,375 @@
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from bench_fixtures import FakeSkyServer, LibraryGenerator
+from sky_organizer import OrganizerOptions, ProcessingMode, SkyFileOrganizer
+
+ALL_MODES = [
+    ProcessingMode.FILE_ORGANIZER,
+    ProcessingMode.FOLDER_MERGER,
+    ProcessingMode.FILE_COLLECTOR,
+    ProcessingMode.DUPLICATE_FIXER,
+    ProcessingMode.REMOVE_NUMBER,
+    ProcessingMode.SINGLE_FOLDER,
+    ProcessingMode.PREVIEW_DEDUP,
+]
+
+# Modes that work in place on the source directory
+SOURCE_ONLY_MODES = {
+    ProcessingMode.DUPLICATE_FIXER,
+    ProcessingMode.REMOVE_NUMBER,
+    ProcessingMode.PREVIEW_DEDUP,
+}
+
+
+def prepare_workspace(mode, workspace, generator):
+    """Generate the source tree for a mode, returns (source, destination)"""
+    source = os.path.join(workspace, "source")
+    destination = os.path.join(workspace, "destination")
+    os.makedirs(destination, exist_ok=True)
+
+    if mode == ProcessingMode.FILE_ORGANIZER:
+        generator.flat_source(source)
+    elif mode == ProcessingMode.FOLDER_MERGER:
+        generator.organized_tree(os.path.join(source, "3ds_models"))
+        # Half of the destination library overlaps with the source
+        generator.organized_tree(
+            os.path.join(destination, "3ds_models"), offset=generator.files // 2
+        )
+    elif mode in (
+        ProcessingMode.FILE_COLLECTOR,
+        ProcessingMode.SINGLE_FOLDER,
+        ProcessingMode.PREVIEW_DEDUP,
+    ):
+        generator.organized_tree(os.path.join(source, "3ds_models"))
+    else:  # DUPLICATE_FIXER, REMOVE_NUMBER
+        generator.duplicate_source(source)
+
+    if mode in SOURCE_ONLY_MODES:
+        return source, None
+    return source, destination
+
+
+def run_shard_worker(source, destination, base_url, workers, api_delay, shard):
+    """One File Organizer process of a sharded run, returns its API request count"""
+    organizer = SkyFileOrganizer(
+        source,
+        destination,
+        OrganizerOptions(
+            max_workers=workers, api_delay=api_delay, preview_cache=False, shard=shard
+        ),
+    )
+    organizer.api_url = f"{base_url}/api/models"
+    organizer.image_base_url = f"{base_url}/media/"
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        organizer.run(ProcessingMode.FILE_ORGANIZER)
+    return organizer.progress.snapshot()["api_requests"]
+
+
+def run_sharded(workspace, generator, server, args):
+    """File Organizer split over several processes sharing a lease shard"""
+    from multiprocessing import Pool
+
+    source, destination = prepare_workspace(
+        ProcessingMode.FILE_ORGANIZER, workspace, generator
+    )
+    jobs = [
+        (source, destination, server.base_url, args.workers, args.api_delay, "bench")
+    ] * args.processes
+    with Pool(args.processes) as pool:
+        start = time.perf_counter()
+        api_requests = pool.starmap(run_shard_worker, jobs)
+        seconds = time.perf_counter() - start
+    return {
+        "mode": ProcessingMode.FILE_ORGANIZER,
+        "processes": args.processes,
+        "seconds": round(seconds, 4),
+        "files": generator.files,
+        "api_requests": sum(api_requests),
+        "files_per_sec": round(generator.files / seconds, 2) if seconds else 0,
+    }
+
+
+def run_mode(mode, workspace, generator, server, args):
+    if mode == ProcessingMode.FILE_ORGANIZER and args.processes > 1:
+        return run_sharded(workspace, generator, server, args)
+    source, destination = prepare_workspace(mode, workspace, generator)
+    organizer = SkyFileOrganizer(
+        source,
+        destination,
+        OrganizerOptions(
+            max_workers=args.workers,
+            api_delay=args.api_delay,
+            preview_cache_dir=os.path.join(workspace, "preview_cache"),
+        ),
+    )
+    organizer.api_url = f"{server.base_url}/api/models"
+    organizer.image_base_url = f"{server.base_url}/media/"
+
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        start = time.perf_counter()
+        organizer.run(mode, operation=args.operation)
+        seconds = time.perf_counter() - start
+
+    snapshot = organizer.progress.snapshot()
+    report = organizer.metrics.report(mode)
+    return {
+        "mode": mode,
+        "seconds": round(seconds, 4),
+        "files": snapshot["current"],
+        "bytes": snapshot["bytes"],
+        "api_requests": snapshot["api_requests"],
+        "files_per_sec": round(snapshot["current"] / seconds, 2) if seconds else 0,
+        "stages": {
+            stage: {
+                key: stats[key]
+                for key in ("count", "mean_seconds", "p90_seconds", "bytes")
+            }
+            for stage, stats in report["stages"].items()
+        },
+        "errors": report["errors"],
+    }
+
+
+# Modules that must only load when a mode actually needs them
+HEAVY_MODULES = ["tkinter", "requests", "PIL", "cProfile", "pstats"]
+STARTUP_MODULES = ["sky_organizer", "org", "sky_organizer_gui"]
+
+
+def import_time(module):
+    """Cumulative import time of a module in milliseconds, from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)$", line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) / 1000
+    return None
+
+
+def loaded_heavy_modules(module):
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    return [m for m in result.stdout.strip().split(",") if m]
+
+
+def time_to_first_window(command):
+    """Seconds from launch until the GUI has drawn its window and exited"""
+    env = dict(os.environ, SKY_ORGANIZER_EXIT_AFTER_STARTUP="1")
+    start = time.perf_counter()
+    result = subprocess.run(command, env=env, capture_output=True, timeout=120)
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        return None  # No display or a broken build
+    return round(seconds, 4)
+
+
+def measure_startup(args):
+    """Import times per entry point and time to first window, median of repeats"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    startup = {"imports_ms": {}, "heavy_modules": {}, "first_window_seconds": {}}
+    for module in STARTUP_MODULES:
+        samples = [import_time(module) for _ in range(args.repeat)]
+        samples = [s for s in samples if s is not None]
+        startup["imports_ms"][module] = (
+            round(statistics.median(samples), 2) if samples else None
+        )
+        startup["heavy_modules"][module] = loaded_heavy_modules(module)
+        print(
+            f"⏱️ import {module}: {startup['imports_ms'][module]} ms, "
+            f"loads {startup['heavy_modules'][module] or 'no heavy modules'}"
+        )
+
+    commands = {
+        "script": [sys.executable, os.path.join(script_dir, "sky_organizer_gui.py")]
+    }
+    if args.frozen:
+        commands["frozen"] = [args.frozen]
+    for name, command in commands.items():
+        samples = [time_to_first_window(command) for _ in range(args.repeat)]
+        samples = [s for s in samples if s is not None]
+        startup["first_window_seconds"][name] = (
+            statistics.median(samples) if samples else None
+        )
+        print(f"⏱️ first window ({name}): {startup['first_window_seconds'][name]} s")
+    return startup
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def compare(results, baseline_path):
+    """Print the change in wall time for every mode against a previous result file"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["mode"]: r for r in json.load(f).get("results", [])}
+    print(f"\n📊 Compared with {baseline_path}")
+    for result in results:
+        previous = baseline.get(result["mode"])
+        if not previous or not previous["seconds"]:
+            continue
+        change = (result["seconds"] - previous["seconds"]) / previous["seconds"] * 100
+        print(
+            f"  {result['mode']:<18} {previous['seconds']:>8.3f}s -> "
+            f"{result['seconds']:>8.3f}s ({change:+.1f}%)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark every processing mode against a synthetic library"
+    )
+    parser.add_argument("--files", type=int, default=200, help="Archives per mode")
+    parser.add_argument(
+        "--archive-size", type=int, default=64 * 1024, help="Bytes per archive"
+    )
+    parser.add_argument("--depth", type=int, default=2, help="Category tree depth")
+    parser.add_argument(
+        "--duplicate-ratio", type=float, default=0.2, help="Share of (N) copies"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Fake server latency in seconds"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Share of 500 responses"
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="Share of 429 responses"
+    )
+    parser.add_argument(
+        "--not-found-rate", type=float, default=0.0, help="Share of unknown IDs"
+    )
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="File Organizer processes sharing the work through lease files",
+    )
+    parser.add_argument(
+        "--api-delay",
+        type=float,
+        default=0.0,
+        help="Worker sleep after each API lookup (the GUI uses 1 second)",
+    )
+    parser.add_argument("--operation", choices=["move", "copy"], default="move")
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=ALL_MODES,
+        default=ALL_MODES,
+        metavar="MODE",
+        help="Modes to run (default: all)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the generated workspaces"
+    )
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="Measure import time and time to first window instead of the modes",
+    )
+    parser.add_argument(
+        "--frozen", help="PyInstaller build to include in the startup measurement"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Startup samples per measurement"
+    )
+    args = parser.parse_args()
+
+    if args.startup:
+        output = {"environment": environment(), "startup": measure_startup(args)}
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(output, f, indent=4)
+            print(f"📝 Results written to {args.output}")
+        return 0
+
+    generator = LibraryGenerator(
+        files=args.files,
+        archive_size=args.archive_size,
+        duplicate_ratio=args.duplicate_ratio,
+        depth=args.depth,
+        seed=args.seed,
+    )
+    server = FakeSkyServer(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        not_found_rate=args.not_found_rate,
+        seed=args.seed,
+    ).start()
+
+    root = tempfile.mkdtemp(prefix="3dsky_bench_")
+    results = []
+    try:
+        for mode in args.modes:
+            workspace = os.path.join(root, mode.replace(" ", "_").strip("()"))
+            print(f"⏱️ {mode}...", end=" ", flush=True)
+            result = run_mode(mode, workspace, generator, server, args)
+            results.append(result)
+            print(f"{result['seconds']:.3f}s, {result['files_per_sec']} files/s")
+    finally:
+        server.stop()
+        if args.keep:
+            print(f"📁 Workspaces kept in {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    output = {
+        "environment": environment(),
+        "config": vars(args),
+        "server": server.stats,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=4)
+        print(f"📝 Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
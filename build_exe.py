@@ -12,10 +12,14 @@ icon_path = os.path.join(script_dir, "icon.ico")
 # Set the output filename with the .exe extension
 output_filename = "3DSky_Organizer_multiple.exe"
 
+# --onedir skips unpacking the whole bundle to a temp folder on every launch,
+# measure the difference with: python benchmark.py --startup --frozen <exe>
+bundle_mode = "--onedir" if "--onedir" in sys.argv[1:] else "--onefile"
+
 PyInstaller.__main__.run(
     [
         "sky_organizer_gui.py",  # your main script
-        "--onefile",  # create a single executable
+        bundle_mode,  # single executable by default
         "--windowed",  # prevent console window from appearing
         f"--add-data={icon_path}:.",  # include the icon
         "--icon",
@@ -0,0 +1,101 @@
+import os
+import re
+from functools import lru_cache
+from threading import Lock
+
+INVALID_CHARS = re.compile(r'[<>:"/\\|?*]')
+
+
+@lru_cache(maxsize=4096)
+def sanitize(category):
+    """Category name without characters that are invalid in folder names"""
+    return INVALID_CHARS.sub("", category)
+
+
+class CategoryPathCache:
+    """Map API category lists to library folders, creating each folder once
+
+    Once a category list was resolved, later files of the same category cost
+    a dict lookup instead of a regex and an exists/makedirs pair per level.
+    Folders are created under a lock, so workers never race on a new category.
+    """
+
+    def __init__(self):
+        self.paths = {}  # (root, raw categories) -> absolute folder
+        self.existing = set()  # Folders known to exist
+        self.lock = Lock()
+
+    def resolve(self, root, categories):
+        """Return (folder, names of the folders created) for a category list"""
+        key = (root, tuple(categories))
+        path = self.paths.get(key)
+        if path is not None:
+            return path, []
+        created = []
+        with self.lock:
+            path = root
+            for category in categories:
+                name = sanitize(category)
+                path = os.path.join(path, name)
+                if path in self.existing:
+                    continue
+                try:
+                    os.mkdir(path)
+                    created.append(name)
+                except FileExistsError:
+                    pass
+                except FileNotFoundError:
+                    # A folder above was deleted after it was cached
+                    self._drop_missing(os.path.dirname(path))
+                    os.makedirs(path, exist_ok=True)
+                    created.append(name)
+                self.existing.add(path)
+            self.paths[key] = path
+        return path, created
+
+    def mark_existing(self, root, relative_folders):
+        """Mark folders already in the library as existing, creating none
+
+        Only folders still on disk are marked, one stat per library folder.
+        """
+        with self.lock:
+            for relative_folder in set(relative_folders):
+                if not os.path.isdir(os.path.join(root, relative_folder)):
+                    continue
+                path = root
+                for part in relative_folder.split(os.sep):
+                    if part:
+                        path = os.path.join(path, part)
+                        self.existing.add(path)
+
+    def discard(self, path):
+        """Forget a folder that turned out to be missing, and its missing parents"""
+        with self.lock:
+            self._forget(path)
+            self._drop_missing(os.path.dirname(path))
+
+    def _drop_missing(self, path):
+        """Forget path and its ancestors up to the first one still on disk"""
+        while not os.path.isdir(path):
+            self._forget(path)
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+
+    def _forget(self, path):
+        """Drop a folder and everything below it from the cache"""
+        prefix = path + os.sep
+        self.existing = {
+            p for p in self.existing if p != path and not p.startswith(prefix)
+        }
+        self.paths = {
+            k: v
+            for k, v in self.paths.items()
+            if v != path and not v.startswith(prefix)
+        }
+
+    def clear(self):
+        with self.lock:
+            self.paths = {}
+            self.existing = set()
@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from library_state import STATE_DIR_NAME
+from log_setup import LOGGER_NAME
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class FailureStage:
+    PARSE = "parse"
+    LOOKUP = "lookup"
+    MOVE = "move"
+    DOWNLOAD = "download"
+    VERIFY = "verify"
+
+
+class FailureLog:
+    """Append-only NDJSON failure log written by a single background thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self.events = queue.Queue()
+        self.count = 0
+        self.count_lock = threading.Lock()
+        self.thread = None
+        self.file = None
+        self.started = None  # Time of the first possible event, see compact()
+
+    def start(self):
+        """Open the log, raising OSError here rather than in the writer thread"""
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.started = time.strftime(TIME_FORMAT)
+        self.thread = threading.Thread(
+            target=self._writer, name="FailureLogWriter", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def record(self, key, reason, message, stage):
+        """Queue a failure event, safe to call from any thread"""
+        with self.count_lock:
+            self.count += 1
+        self.events.put(
+            {
+                "time": time.strftime(TIME_FORMAT),
+                "key": key,
+                "reason": reason,
+                "stage": stage,
+                "message": message,
+            }
+        )
+
+    def _writer(self):
+        with self.file as f:
+            while True:
+                event = self.events.get()
+                if event is None:
+                    break
+                try:
+                    f.write(json.dumps(event, ensure_ascii=False) + "\n")
+                    # Flush once the backlog is drained so a crash loses little
+                    if self.events.empty():
+                        f.flush()
+                except OSError as e:
+                    # Keep draining the queue, the failure itself is still logged
+                    logging.getLogger(LOGGER_NAME).error(
+                        f"Error writing failure log {self.path}: {str(e)} "
+                        f"({event['key']}: {event['message']})"
+                    )
+
+    def close(self):
+        """Flush pending events and stop the writer thread"""
+        if self.thread:
+            self.events.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+def compact(log_path, output_path, day=None, since=None):
+    """Write the latest failure per key as JSON
+
+    Only failures logged at or after since ("YYYY-MM-DD HH:MM:SS", e.g. the
+    start of a run, so runs crossing midnight keep all their failures) or on
+    day ("YYYY-MM-DD") are kept; with neither, every failure in the log is.
+    log_path may also be a list, to merge the logs of several processes.
+    """
+    log_paths = [log_path] if isinstance(log_path, str) else log_path
+    events = []
+    for path in log_paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # Truncated line from an interrupted run
+                logged = event.get("time", "")
+                if (since and logged < since) or (day and not logged.startswith(day)):
+                    continue
+                events.append(event)
+    summary = {}
+    for event in sorted(events, key=lambda e: e["time"]):
+        summary[event["key"]] = event["message"]
+
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=4)
+    os.replace(temp_path, output_path)
+    return summary
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Compact a 3DSky failure log into a JSON summary"
+    )
+    parser.add_argument("log", help="Path to not_found_models.ndjson")
+    parser.add_argument(
+        "--output", "-o", help="Summary path (default: not_found_models.json)"
+    )
+    parser.add_argument(
+        "--date", help="Day to summarize as YYYY-MM-DD (default: today)"
+    )
+    args = parser.parse_args()
+
+    # The summary goes to 3ds_models, next to the bookkeeping folder of the log
+    log_dir = os.path.dirname(os.path.abspath(args.log))
+    if os.path.basename(log_dir) == STATE_DIR_NAME:
+        log_dir = os.path.dirname(log_dir)
+    output_path = args.output or os.path.join(log_dir, "not_found_models.json")
+    summary = compact(args.log, output_path, args.date or time.strftime("%Y-%m-%d"))
+    print(f"📝 Wrote {len(summary)} entries to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
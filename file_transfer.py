@@ -0,0 +1,236 @@
+import errno
+import hashlib
+import os
+import shutil
+import threading
+import time
+
+
+class TransferEngine:
+    """Move and copy files, with a verified chunked copy between devices
+
+    Moves on the same device are a single rename. Across devices the file is
+    copied into a temporary name next to the destination, checked, fsynced
+    and renamed into place, so an interrupted copy never leaves a partial
+    file under the final name. The source of a moved file is unlinked right
+    after its copy and the destination folder were fsynced; folders of plain
+    copies are fsynced in batches. An existing destination is only replaced
+    with replace=True, and then only by a complete, checked copy.
+    """
+
+    def __init__(
+        self,
+        verify=False,
+        buffer_size=8 * 1024 * 1024,
+        sync_batch_bytes=256 * 1024 * 1024,
+        sync_batch_files=64,
+    ):
+        self.verify = verify
+        self.buffer_size = buffer_size
+        self.sync_batch_bytes = sync_batch_bytes
+        self.sync_batch_files = sync_batch_files
+        self.lock = threading.Lock()
+        # (source dev, destination dev) -> [files, bytes, seconds]
+        self.device_stats = {}
+        self.pending_dirs = set()  # Folders of copies that aren't durable yet
+        self.pending_files = 0
+        self.pending_bytes = 0
+        self.touched_dirs = set()  # Source folders that moves took files from
+
+    def transfer(self, source_path, dest_path, operation="move", replace=False):
+        """Move or copy a file, returns its size
+
+        Raises FileExistsError if dest_path exists, unless replace is set.
+        """
+        if os.path.isdir(dest_path):
+            dest_path = os.path.join(dest_path, os.path.basename(source_path))
+        if not replace and os.path.lexists(dest_path):
+            raise _exists_error(dest_path)
+        stat = os.stat(source_path)
+        dest_dir = os.path.dirname(os.path.abspath(dest_path))
+        dest_dev = os.stat(dest_dir).st_dev
+        if operation == "move":
+            with self.lock:
+                self.touched_dirs.add(os.path.dirname(os.path.abspath(source_path)))
+
+        if operation == "move" and stat.st_dev == dest_dev:
+            try:
+                if replace:
+                    os.replace(source_path, dest_path)
+                else:
+                    _rename_no_clobber(source_path, dest_path)
+                return stat.st_size
+            except OSError as e:
+                if e.errno != errno.EXDEV:  # Bind mounts share st_dev
+                    raise
+
+        start = time.perf_counter()
+        self._copy(source_path, dest_path, stat, replace)
+        seconds = time.perf_counter() - start
+        with self.lock:
+            stats = self.device_stats.setdefault((stat.st_dev, dest_dev), [0, 0, 0.0])
+            stats[0] += 1
+            stats[1] += stat.st_size
+            stats[2] += seconds
+        if operation == "move":
+            # The copy must survive a crash before its only other copy goes
+            _fsync_dir(dest_dir)
+            os.remove(source_path)
+            return stat.st_size
+        with self.lock:
+            self.pending_dirs.add(dest_dir)
+            self.pending_files += 1
+            self.pending_bytes += stat.st_size
+            flush = (
+                self.pending_bytes >= self.sync_batch_bytes
+                or self.pending_files >= self.sync_batch_files
+            )
+        if flush:
+            self.flush()
+        return stat.st_size
+
+    def _copy(self, source_path, dest_path, stat, replace=False):
+        temp_path = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            with open(source_path, "rb") as src, open(temp_path, "wb") as dst:
+                digest = self._copy_data(src, dst, stat.st_size)
+                os.fsync(dst.fileno())
+            shutil.copystat(source_path, temp_path)
+            copied = os.path.getsize(temp_path)
+            if copied != stat.st_size:
+                raise OSError(
+                    f"Size mismatch copying {source_path}: {copied} != {stat.st_size}"
+                )
+            if digest is not None and self._hash(temp_path) != digest:
+                raise OSError(f"Checksum mismatch copying {source_path}")
+            if replace:
+                os.replace(temp_path, dest_path)
+            else:
+                _rename_no_clobber(temp_path, dest_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _copy_data(self, src, dst, size):
+        """Copy file contents, returns the source digest when verifying"""
+        if not self.verify and hasattr(os, "copy_file_range"):
+            # In-kernel copy, server side on NFS 4.2 and SMB3
+            try:
+                copied = 0
+                while copied < size:
+                    sent = os.copy_file_range(
+                        src.fileno(), dst.fileno(), self.buffer_size
+                    )
+                    if sent == 0:
+                        break
+                    copied += sent
+                return None
+            except OSError as e:
+                if e.errno not in (
+                    errno.EXDEV,
+                    errno.ENOSYS,
+                    errno.EINVAL,
+                    errno.EOPNOTSUPP,
+                ):
+                    raise
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+
+        digest = hashlib.blake2b() if self.verify else None
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        while True:
+            n = src.readinto(buffer)
+            if not n:
+                break
+            if digest is not None:
+                digest.update(view[:n])
+            dst.write(view[:n])
+        return digest.digest() if digest is not None else None
+
+    def _hash(self, path):
+        digest = hashlib.blake2b()
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        with open(path, "rb") as f:
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                digest.update(view[:n])
+        return digest.digest()
+
+    def flush(self):
+        """Make pending copies durable"""
+        with self.lock:
+            dirs, self.pending_dirs = self.pending_dirs, set()
+            self.pending_files = 0
+            self.pending_bytes = 0
+        for directory in dirs:
+            _fsync_dir(directory)
+
+    def report(self):
+        """Cross-device copy throughput per device pair"""
+        with self.lock:
+            stats = dict(self.device_stats)
+        return {
+            f"{source_dev}->{dest_dev}": {
+                "files": files,
+                "bytes": nbytes,
+                "mb_per_sec": (
+                    round(nbytes / seconds / (1024 * 1024), 2) if seconds else 0
+                ),
+            }
+            for (source_dev, dest_dev), (files, nbytes, seconds) in stats.items()
+        }
+
+    def take_touched(self):
+        """Source folders emptied of at least one file since the last call"""
+        with self.lock:
+            touched, self.touched_dirs = self.touched_dirs, set()
+        return touched
+
+    def reset(self):
+        with self.lock:
+            self.device_stats = {}
+            self.touched_dirs = set()
+
+
+def _exists_error(path):
+    return FileExistsError(errno.EEXIST, "Destination path already exists", path)
+
+
+def _rename_no_clobber(source_path, dest_path):
+    """Rename that fails instead of replacing an existing destination"""
+    try:
+        os.link(source_path, dest_path)
+    except FileExistsError:
+        raise _exists_error(dest_path) from None
+    except OSError as e:
+        if e.errno == errno.EXDEV:
+            raise
+        # No hard links (FAT, some shares): check, then rename, which on
+        # Windows refuses an existing destination by itself
+        if os.path.lexists(dest_path):
+            raise _exists_error(dest_path) from None
+        os.rename(source_path, dest_path)
+        return
+    os.remove(source_path)
+
+
+def _fsync_dir(directory):
+    """Persist directory entries, not supported on Windows"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,198 @@
+import io
+import os
+import re
+import struct
+from threading import Lock
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Start-of-frame markers carrying the dimensions (C4, C8 and CC are not frames)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def read_dimensions(f):
+    """Read (width, height) from a JPEG, PNG or WebP header, None for other formats"""
+    head = f.read(30)
+    if head.startswith(PNG_SIGNATURE) and head[12:16] == b"IHDR":
+        return struct.unpack(">II", head[16:24])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) == 30:
+        return read_webp_dimensions(head)
+    if not head.startswith(b"\xff\xd8"):
+        return None
+
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":  # Fill bytes before the marker
+            marker = f.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD8:
+            continue  # Markers without a length field
+        if code in (0xD9, 0xDA):
+            return None  # Image data reached without a frame header
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if code in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_webp_dimensions(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        b = head[21:25]
+        width = 1 + (((b[1] & 0x3F) << 8) | b[0])
+        height = 1 + (((b[3] & 0x0F) << 10) | (b[2] << 2) | ((b[1] & 0xC0) >> 6))
+        return width, height
+    if chunk == b"VP8X":
+        width = 1 + int.from_bytes(head[24:27], "little")
+        height = 1 + int.from_bytes(head[27:30], "little")
+        return width, height
+    return None
+
+
+def probe_dimensions(path):
+    """Image dimensions from the file header, falls back to Pillow for other formats"""
+    with open(path, "rb") as f:
+        dimensions = read_dimensions(f)
+    if dimensions:
+        return dimensions
+    from PIL import Image  # Only for formats the header reader doesn't know
+
+    with Image.open(path) as img:
+        return img.size
+
+
+def probe_bytes(data):
+    """Image dimensions of an in-memory image"""
+    dimensions = read_dimensions(io.BytesIO(data))
+    if dimensions:
+        return dimensions
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        return img.size
+
+
+def image_rank(image):
+    """Sort key for previews, resolution first, then file size"""
+    return (image["resolution"], image["size"])
+
+
+class ImageProbeCache:
+    """Image dimensions cached by (path, size, mtime), unchanged images are read once"""
+
+    def __init__(self):
+        self.entries = {}  # path -> (size, mtime_ns, width, height)
+        self.lock = Lock()
+
+    def probe(self, path):
+        """Return {"path", "width", "height", "resolution", "size"} for an image"""
+        stat = os.stat(path)
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            width, height = entry[2], entry[3]
+        else:
+            width, height = probe_dimensions(path)
+            with self.lock:
+                self.entries[path] = (stat.st_size, stat.st_mtime_ns, width, height)
+        return {
+            "path": path,
+            "width": width,
+            "height": height,
+            "resolution": width * height,
+            "size": stat.st_size,
+        }
+
+    def store(self, path, width, height):
+        """Cache the dimensions of an image that was just written"""
+        stat = os.stat(path)
+        with self.lock:
+            self.entries[path] = (stat.st_size, stat.st_mtime_ns, width, height)
+
+    def discard(self, path):
+        with self.lock:
+            self.entries.pop(path, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+
+def model_number_of(filename):
+    """Leading model number of a file name, e.g. "12345" for "12345.abc.jpeg" """
+    match = re.match(r"\d+", filename)
+    return match.group(0) if match else None
+
+
+class PreviewFolderIndex:
+    """Preview images per category folder, grouped by model number
+
+    A folder is listed once, on first use, and kept up to date as previews
+    are added and removed, so crowded folders aren't listed for every file.
+    """
+
+    def __init__(self):
+        self.folders = {}  # folder -> {model_number: set of file names}
+        self.lock = Lock()
+
+    def _load(self, folder):
+        images = {}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                    model_number = model_number_of(entry.name)
+                    if model_number:
+                        images.setdefault(model_number, set()).add(entry.name)
+        return images
+
+    def candidates(self, folder, model_number):
+        """Paths of the previews in a folder that belong to a model number"""
+        with self.lock:
+            images = self.folders.get(folder)
+            if images is None:
+                images = self.folders[folder] = self._load(folder)
+            names = sorted(images.get(model_number, ()))
+        return [os.path.join(folder, name) for name in names]
+
+    def add(self, path):
+        folder, name = os.path.split(path)
+        model_number = model_number_of(name)
+        with self.lock:
+            images = self.folders.get(folder)
+            # Unloaded folders pick the file up when they are first listed
+            if images is not None and model_number:
+                images.setdefault(model_number, set()).add(name)
+
+    def discard(self, path):
+        folder, name = os.path.split(path)
+        model_number = model_number_of(name)
+        with self.lock:
+            images = self.folders.get(folder)
+            if images is not None and model_number in images:
+                images[model_number].discard(name)
+
+    def clear(self):
+        with self.lock:
+            self.folders = {}
@@ -0,0 +1,212 @@
+import functools
+import json
+import os
+import time
+from threading import Lock
+
+# Histogram bucket upper bounds in seconds, matching Prometheus conventions
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.bytes = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # Last slot is +Inf
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def quantile(self, q):
+        """Approximate quantile from the histogram (bucket upper bound)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 6),
+            "mean_seconds": round(self.total / self.count, 6) if self.count else 0,
+            "p50_seconds": self.quantile(0.5),
+            "p90_seconds": self.quantile(0.9),
+            "p99_seconds": self.quantile(0.99),
+            "max_seconds": round(self.max, 6),
+            "bytes": self.bytes,
+            "mb_per_sec": (
+                round(self.bytes / self.total / (1024 * 1024), 3)
+                if self.total and self.bytes
+                else 0
+            ),
+            "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], self.buckets)),
+        }
+
+
+class Timing:
+    """Context manager returned by Metrics.time, set nbytes to record a transfer"""
+
+    def __init__(self, metrics, stage, nbytes=0):
+        self.metrics = metrics
+        self.stage = stage
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start, self.nbytes)
+        if exc_type is not None:
+            self.metrics.error(self.stage, exc_type.__name__)
+        return False
+
+
+class Metrics:
+    """Thread-safe per-stage latency histograms, byte counters and error counters"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.errors = {}  # (stage, reason) -> count
+            self.started = time.time()
+
+    def time(self, stage, nbytes=0):
+        return Timing(self, stage, nbytes)
+
+    def observe(self, stage, seconds, nbytes=0):
+        with self.lock:
+            stats = self.stages.setdefault(stage, StageStats())
+            stats.observe(seconds)
+            stats.bytes += nbytes
+
+    def add_bytes(self, stage, nbytes):
+        with self.lock:
+            self.stages.setdefault(stage, StageStats()).bytes += nbytes
+
+    def error(self, stage, reason="error"):
+        with self.lock:
+            key = (stage, reason)
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def report(self, mode, extra=None):
+        with self.lock:
+            report = {
+                "mode": mode,
+                "started": time.strftime(
+                    "%Y-%m-%d %H:%M:%S", time.localtime(self.started)
+                ),
+                "duration_seconds": round(time.time() - self.started, 3),
+                "stages": {
+                    stage: stats.to_dict() for stage, stats in self.stages.items()
+                },
+                "errors": [
+                    {"stage": stage, "reason": reason, "count": count}
+                    for (stage, reason), count in self.errors.items()
+                ],
+            }
+        if extra:
+            report.update(extra)
+        return report
+
+    def write_report(self, path, mode, extra=None):
+        """Write the run report as JSON"""
+        report = self.report(mode, extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        return report
+
+    def write_prometheus(self, path, mode):
+        """Write a node exporter textfile, renamed into place atomically"""
+        label_mode = mode.replace('"', "")
+        lines = [
+            "# HELP sky_organizer_stage_duration_seconds Time spent per stage call.",
+            "# TYPE sky_organizer_stage_duration_seconds histogram",
+        ]
+        with self.lock:
+            stages = dict(self.stages)
+            errors = dict(self.errors)
+            duration = time.time() - self.started
+
+        for stage, stats in stages.items():
+            labels = f'mode="{label_mode}",stage="{stage}"'
+            cumulative = 0
+            for bound, count in zip(list(BUCKETS) + ["+Inf"], stats.buckets):
+                cumulative += count
+                lines.append(
+                    f"sky_organizer_stage_duration_seconds_bucket"
+                    f'{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f"sky_organizer_stage_duration_seconds_sum{{{labels}}} {stats.total}"
+            )
+            lines.append(
+                f"sky_organizer_stage_duration_seconds_count{{{labels}}} {stats.count}"
+            )
+
+        lines += [
+            "# HELP sky_organizer_stage_bytes_total Bytes transferred per stage.",
+            "# TYPE sky_organizer_stage_bytes_total counter",
+        ]
+        for stage, stats in stages.items():
+            lines.append(
+                f'sky_organizer_stage_bytes_total{{mode="{label_mode}",'
+                f'stage="{stage}"}} {stats.bytes}'
+            )
+
+        lines += [
+            "# HELP sky_organizer_errors_total Errors per stage and reason.",
+            "# TYPE sky_organizer_errors_total counter",
+        ]
+        for (stage, reason), count in errors.items():
+            lines.append(
+                f'sky_organizer_errors_total{{mode="{label_mode}",stage="{stage}",'
+                f'reason="{reason}"}} {count}'
+            )
+
+        lines += [
+            "# HELP sky_organizer_run_duration_seconds Duration of the last run.",
+            "# TYPE sky_organizer_run_duration_seconds gauge",
+            f'sky_organizer_run_duration_seconds{{mode="{label_mode}"}} {duration:.3f}',
+            "# HELP sky_organizer_last_run_timestamp_seconds End time of the last run.",
+            "# TYPE sky_organizer_last_run_timestamp_seconds gauge",
+            f'sky_organizer_last_run_timestamp_seconds{{mode="{label_mode}"}} '
+            f"{time.time():.0f}",
+        ]
+
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, path)
+
+
+def timed(stage):
+    """Decorator timing a SkyFileOrganizer method into self.metrics"""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.time(stage):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,140 @@
+import json
+import os
+import time
+from threading import Lock
+
+from library_state import STATE_DIR_NAME, state_path
+
+ARCHIVE_EXTENSIONS = (".zip", ".rar", ".7z")
+
+
+class LibraryIndex:
+    """In-memory index of the file IDs already organized under 3ds_models"""
+
+    catalog_name = "library_index.json"
+
+    def __init__(self, models_root, extract_file_id):
+        self.models_root = models_root
+        self.extract_file_id = extract_file_id
+        self.catalog_path = state_path(models_root, self.catalog_name)
+        self.files = {}  # file_id -> path relative to models_root
+        self.lock = Lock()
+        self.dirty = False
+        self.removed = set()  # IDs discarded this run, not restored on merge
+
+    def load_or_scan(self, rescan=False):
+        """Load the persisted catalog, falling back to a fresh scan"""
+        if not rescan and self.load():
+            return "catalog"
+        self.scan()
+        return "scan"
+
+    def load(self):
+        """Load the persisted catalog, returns False if it is missing or unreadable"""
+        try:
+            with open(self.catalog_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            files = data["files"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        with self.lock:
+            self.files = dict(files)
+            self.dirty = False
+        return True
+
+    def scan(self):
+        """Rebuild the index by walking the library with os.scandir"""
+        files = {}
+        stack = [self.models_root]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name != STATE_DIR_NAME:
+                                stack.append(entry.path)
+                        elif entry.name.lower().endswith(ARCHIVE_EXTENSIONS):
+                            file_id = self.extract_file_id(entry.name)
+                            if file_id:
+                                files[file_id] = os.path.relpath(
+                                    entry.path, self.models_root
+                                )
+            except OSError:
+                continue
+        with self.lock:
+            self.files = files
+            self.dirty = True
+
+    def lookup(self, file_id):
+        """Return the absolute path of an organized file, or None"""
+        with self.lock:
+            relative_path = self.files.get(file_id)
+        if relative_path is None:
+            return None
+        path = os.path.join(self.models_root, relative_path)
+        if os.path.exists(path):
+            return path
+        # Stale catalog entry, the file was moved or deleted by hand
+        self.discard(file_id)
+        return None
+
+    def add(self, file_id, path):
+        with self.lock:
+            self.files[file_id] = os.path.relpath(path, self.models_root)
+            self.dirty = True
+            self.removed.discard(file_id)
+
+    def discard(self, file_id):
+        with self.lock:
+            if self.files.pop(file_id, None) is not None:
+                self.dirty = True
+                self.removed.add(file_id)
+
+    def folders(self):
+        """Folders holding organized files, relative to models_root"""
+        with self.lock:
+            return {os.path.dirname(p) for p in self.files.values()}
+
+    def __len__(self):
+        with self.lock:
+            return len(self.files)
+
+    def save(self, merge=False):
+        """Persist the catalog if it changed during this run
+
+        With merge, entries saved meanwhile by other processes sharing the
+        library are kept.
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            files = dict(self.files)
+            removed = set(self.removed)
+            self.dirty = False
+        if merge:
+            try:
+                with open(self.catalog_path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)["files"]
+                files = {
+                    **{k: v for k, v in saved.items() if k not in removed},
+                    **files,
+                }
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                pass
+        data = {
+            "last_updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "files": files,
+        }
+        temp_path = f"{self.catalog_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.catalog_path)
+
+    @classmethod
+    def invalidate(cls, models_root):
+        """Drop the persisted catalog so the next run rescans the library"""
+        try:
+            os.remove(state_path(models_root, cls.catalog_name))
+        except OSError:
+            pass
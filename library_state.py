@@ -0,0 +1,48 @@
+import os
+
+# Catalogs, caches, leases and thumbnails of the organizer live in this folder
+# inside 3ds_models, so summaries, merges and the other walks never see them
+STATE_DIR_NAME = ".3dsky"
+
+# Bookkeeping that older versions kept directly in 3ds_models
+LEGACY_NAMES = {
+    "library_index.json": "library_index.json",
+    "not_found_cache.json": "not_found_cache.json",
+    "not_found_models.ndjson": "not_found_models.ndjson",
+    "archive_verify_cache.json": "archive_verify_cache.json",
+    "preview_manifest.json": "preview_manifest.json",
+    "preview_hashes.json": "preview_hashes.json",
+    ".leases": "leases",
+    ".thumbnails": "thumbnails",
+}
+
+
+def state_path(models_root, *names):
+    """Path of a bookkeeping file or folder of a library"""
+    return os.path.join(models_root, STATE_DIR_NAME, *names)
+
+
+def prepare_state_dir(models_root):
+    """Create the bookkeeping folder, moving in what older versions left around"""
+    state_dir = state_path(models_root)
+    os.makedirs(state_dir, exist_ok=True)
+    for old_name, new_name in LEGACY_NAMES.items():
+        old_path = os.path.join(models_root, old_name)
+        new_path = os.path.join(state_dir, new_name)
+        if os.path.lexists(old_path) and not os.path.lexists(new_path):
+            try:
+                os.rename(old_path, new_path)
+            except OSError:
+                pass
+    return state_dir
+
+
+def walk_library(top, topdown=True):
+    """os.walk that skips bookkeeping folders"""
+    for root, dirs, files in os.walk(top, topdown=topdown):
+        # Bottom-up walks list the folder's contents before its parent
+        if STATE_DIR_NAME in os.path.relpath(root, top).split(os.sep):
+            continue
+        if STATE_DIR_NAME in dirs:
+            dirs.remove(STATE_DIR_NAME)
+        yield root, dirs, files
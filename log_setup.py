@@ -0,0 +1,142 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from threading import Lock
+
+LOGGER_NAME = "sky_organizer"
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# Install-wide log in the user's home, never in the working directory
+DEFAULT_LOG_PATH = os.path.join(
+    os.path.expanduser("~"), ".3dsky_organizer", "3dsky_organizer.log"
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%d %H:%M:%S"),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def make_formatter(json_format):
+    return JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+
+
+class LogManager:
+    """Queue-based logging: workers only enqueue records, one listener thread writes
+
+    The install-wide log rotates by size, and each run can add its own log file
+    in the destination. Run logs beyond `keep_runs` are pruned.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue(-1)
+        self.lock = Lock()
+        self.listener = None
+        self.base_handlers = []
+        self.run_handler = None
+        self.logger = None
+
+    def configure(
+        self,
+        log_path=DEFAULT_LOG_PATH,
+        json_format=False,
+        max_bytes=10 * 1024 * 1024,
+        backup_count=3,
+    ):
+        """Install the queue handler once per process, returns the logger"""
+        with self.lock:
+            if self.logger is not None:
+                return self.logger
+            logger = logging.getLogger(LOGGER_NAME)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(QueueHandler(self.queue))
+
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            handler = RotatingFileHandler(
+                log_path,
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                encoding="utf-8",
+                delay=True,
+            )
+            handler.setFormatter(make_formatter(json_format))
+            self.base_handlers = [handler]
+            self._restart_listener()
+            atexit.register(self.shutdown)
+            self.logger = logger
+            return logger
+
+    def _restart_listener(self):
+        # Stopping the listener drains the queue into the previous handlers first
+        if self.listener is not None:
+            self.listener.stop()
+        handlers = list(self.base_handlers)
+        if self.run_handler is not None:
+            handlers.append(self.run_handler)
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def start_run(self, log_dir, label, json_format=False, keep_runs=20):
+        """Add a per-run log file in log_dir, returns its path"""
+        os.makedirs(log_dir, exist_ok=True)
+        slug = re.sub(r"[^a-z0-9]+", "_", label.lower()).strip("_")
+        path = os.path.join(log_dir, f"run_{time.strftime('%Y%m%d_%H%M%S')}_{slug}.log")
+        handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+        handler.setFormatter(make_formatter(json_format))
+        with self.lock:
+            self.run_handler = handler
+            self._restart_listener()
+        prune_run_logs(log_dir, keep_runs)
+        return path
+
+    def end_run(self):
+        """Flush and detach the per-run log file"""
+        with self.lock:
+            handler, self.run_handler = self.run_handler, None
+            if self.listener is not None:
+                self._restart_listener()
+        if handler is not None:
+            handler.close()
+
+    def shutdown(self):
+        with self.lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+            for handler in self.base_handlers:
+                handler.close()
+
+
+def prune_run_logs(log_dir, keep):
+    """Delete the oldest run logs so at most `keep` remain"""
+    try:
+        logs = sorted(
+            f
+            for f in os.listdir(log_dir)
+            if f.startswith("run_") and f.endswith(".log")
+        )
+    except OSError:
+        return
+    for name in logs[:-keep]:
+        try:
+            os.remove(os.path.join(log_dir, name))
+        except OSError:
+            pass
+
+
+log_manager = LogManager()
@@ -0,0 +1,128 @@
+import json
+import os
+import time
+from threading import Lock
+
+from library_state import state_path
+
+
+class MissReason:
+    NOT_FOUND = "not_found"
+    NO_CATEGORIES = "no_categories"
+    NO_IMAGE = "no_image"
+    NETWORK = "network"
+    ERROR = "error"
+
+
+# Seconds before a cached miss is looked up again
+DEFAULT_TTLS = {
+    MissReason.NOT_FOUND: 7 * 24 * 3600,
+    MissReason.NO_CATEGORIES: 7 * 24 * 3600,
+    MissReason.NO_IMAGE: 24 * 3600,
+    MissReason.NETWORK: 3600,
+    MissReason.ERROR: 3600,
+}
+
+
+class NegativeCache:
+    """Persistent cache of file IDs the API could not resolve, with per-reason expiry"""
+
+    cache_name = "not_found_cache.json"
+
+    def __init__(self, models_root, ttls=None):
+        self.cache_path = state_path(models_root, self.cache_name)
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.entries = {}  # file_id -> {"reason", "message", "time", "attempts"}
+        self.lock = Lock()
+        self.dirty = False
+        self.removed = set()  # IDs cleared this run, not restored on merge
+
+    def load(self):
+        """Load cached misses, dropping the ones that already expired"""
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        now = time.time()
+        with self.lock:
+            self.entries = {
+                file_id: entry
+                for file_id, entry in entries.items()
+                if isinstance(entry, dict) and not self._expired(entry, now)
+            }
+            self.dirty = len(self.entries) != len(entries)
+        return len(self.entries)
+
+    def _expired(self, entry, now):
+        ttl = self.ttls.get(entry.get("reason"), self.ttls[MissReason.ERROR])
+        return now - entry.get("time", 0) >= ttl
+
+    def get(self, file_id):
+        """Return the cached miss for a file ID if it has not expired"""
+        with self.lock:
+            entry = self.entries.get(file_id)
+            if entry and self._expired(entry, time.time()):
+                del self.entries[file_id]
+                self.dirty = True
+                return None
+            return entry
+
+    def retry_after(self, entry):
+        """Seconds left before a cached miss expires"""
+        ttl = self.ttls.get(entry.get("reason"), self.ttls[MissReason.ERROR])
+        return max(0, int(entry.get("time", 0) + ttl - time.time()))
+
+    def record(self, file_id, reason, message):
+        with self.lock:
+            previous = self.entries.get(file_id, {})
+            self.entries[file_id] = {
+                "reason": reason,
+                "message": message,
+                "time": time.time(),
+                "attempts": previous.get("attempts", 0) + 1,
+            }
+            self.dirty = True
+            self.removed.discard(file_id)
+
+    def clear(self, file_id):
+        with self.lock:
+            if self.entries.pop(file_id, None) is not None:
+                self.dirty = True
+                self.removed.add(file_id)
+
+    def __contains__(self, file_id):
+        with self.lock:
+            return file_id in self.entries
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def save(self, merge=False):
+        """Persist the cache if it changed during this run
+
+        With merge, misses saved meanwhile by other processes are kept.
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            entries = dict(self.entries)
+            removed = set(self.removed)
+            self.dirty = False
+        if merge:
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                entries = {
+                    **{k: v for k, v in saved.items() if k not in removed},
+                    **entries,
+                }
+            except (OSError, ValueError, AttributeError):
+                pass
+        temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=4)
+        os.replace(temp_path, self.cache_path)
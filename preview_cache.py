@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+
+
+def default_cache_dir():
+    """Per-user preview cache shared by every library on this machine"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "3DSky_Organizer", "preview_cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "3dsky_organizer", "previews")
+
+
+class CacheStatus:
+    FRESH = "fresh"  # Served from the cache without a request
+    REVALIDATED = "revalidated"  # The server answered 304 Not Modified
+    DOWNLOADED = "downloaded"
+
+
+class PreviewCache:
+    """Local HTTP cache of preview images keyed by URL
+
+    Bodies are downloaded to a .part file and renamed into place once complete.
+    An interrupted download resumes with a Range request, guarded by If-Range
+    so a changed image is fetched again from the start. Stale entries are
+    revalidated with If-None-Match/If-Modified-Since. Several processes may
+    share the cache, so each URL is also guarded by a file lock.
+    """
+
+    def __init__(
+        self, cache_dir=None, max_age=7 * 24 * 3600, retries=3, timeout=30, budget=None
+    ):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.budget = budget  # Optional throttle.DownloadBudget
+        self.max_age = max_age
+        self.retries = retries
+        self.timeout = timeout
+        # Seconds to wait for another process downloading the same entry
+        self.lock_timeout = 10 * 60
+        self.locks = {}
+        self.locks_lock = Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + ".body", base + ".json", base + ".part", base + ".part.json"
+
+    def _lock(self, url):
+        with self.locks_lock:
+            return self.locks.setdefault(url, Lock())
+
+    @contextmanager
+    def _file_lock(self, folder):
+        """Lock shared with other processes, one per cache subfolder
+
+        The OS drops it when a process dies, so a killed run never leaves the
+        cache locked. The lock file itself is never deleted. The holder may be
+        downloading, so a waiting process polls with backoff until lock_timeout
+        instead of relying on the platform's own lock wait.
+        """
+        with open(os.path.join(folder, ".lock"), "a+b") as f:
+            if sys.platform == "win32":
+                import msvcrt
+
+                def try_lock():
+                    f.seek(0)
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    except OSError:
+                        return False
+                    return True
+
+                def unlock():
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+            else:
+                import fcntl
+
+                def try_lock():
+                    try:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        return False
+                    return True
+
+                def unlock():
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+            deadline = time.monotonic() + self.lock_timeout
+            delay = 0.05
+            while not try_lock():
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(
+                        f"Preview cache entry locked for {self.lock_timeout}s: {folder}"
+                    )
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+            try:
+                yield
+            finally:
+                unlock()
+
+    @staticmethod
+    def _read_meta(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_meta(path, meta):
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _validators(response):
+        return {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+    def _slot(self, url):
+        if self.budget is None:
+            return nullcontext()
+        return self.budget.slot(url)
+
+    def fetch(self, url):
+        """Return (body_path, status, bytes_transferred) for a preview URL"""
+        body_path = self._paths(url)[0]
+        folder = os.path.dirname(body_path)
+        os.makedirs(folder, exist_ok=True)
+        with self._lock(url), self._file_lock(folder):
+            return self._fetch(url)
+
+    @staticmethod
+    def _drop_part(part_path, part_meta_path):
+        for path in (part_path, part_meta_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _fetch(self, url):
+        import requests
+
+        body_path, meta_path, part_path, part_meta_path = self._paths(url)
+        meta = self._read_meta(meta_path) if os.path.exists(body_path) else None
+        if meta and time.time() - meta.get("checked", 0) < self.max_age:
+            os.utime(body_path)  # Recently used, see prune()
+            return body_path, CacheStatus.FRESH, 0
+
+        transferred = 0
+        attempt = 0
+        while True:
+            headers = {}
+            part_meta = self._read_meta(part_meta_path)
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            validator = part_meta and (part_meta["etag"] or part_meta["last_modified"])
+            if offset and validator:
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = validator
+            elif meta:
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+
+            try:
+                with self._slot(url), requests.get(
+                    url, headers=headers, stream=True, timeout=self.timeout
+                ) as response:
+                    if response.status_code == 304 and meta:
+                        meta["checked"] = time.time()
+                        self._write_meta(meta_path, meta)
+                        os.utime(body_path)
+                        return body_path, CacheStatus.REVALIDATED, transferred
+                    if "Range" in headers and response.status_code not in (200, 206):
+                        # 416 for a .part that was already complete, start over
+                        self._drop_part(part_path, part_meta_path)
+                        continue
+                    response.raise_for_status()
+
+                    if response.status_code == 206:
+                        mode = "ab"  # Resuming the partial body
+                    else:
+                        mode = "wb"
+                        self._write_meta(part_meta_path, self._validators(response))
+                    with open(part_path, mode) as f:
+                        for chunk in response.iter_content(chunk_size=65536):
+                            if chunk:
+                                f.write(chunk)
+                                transferred += len(chunk)
+                                if self.budget is not None:
+                                    self.budget.consume(len(chunk))
+                    validators = self._validators(response)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+            ):
+                attempt += 1
+                if attempt == self.retries:
+                    raise
+                time.sleep(attempt - 1)
+                continue  # Resume from what made it into the .part file
+
+            os.replace(part_path, body_path)
+            if response.status_code == 206 and part_meta:
+                validators = {
+                    "etag": validators["etag"] or part_meta["etag"],
+                    "last_modified": validators["last_modified"]
+                    or part_meta["last_modified"],
+                }
+            self._write_meta(
+                meta_path,
+                dict(validators, url=url, checked=time.time()),
+            )
+            self._drop_part(part_path, part_meta_path)
+            return body_path, CacheStatus.DOWNLOADED, transferred
+
+    def prune(self, max_bytes):
+        """Delete the least recently used bodies until the cache fits in max_bytes"""
+        bodies = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".body"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    bodies.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+        removed = 0
+        for _, size, path in sorted(bodies):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                os.remove(path[: -len(".body")] + ".json")
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,237 @@
+import json
+import os
+from threading import Lock
+
+from image_probe import IMAGE_EXTENSIONS, model_number_of
+from library_state import STATE_DIR_NAME, state_path
+
+SKIP_DIRS = {STATE_DIR_NAME, "Duplicates"}
+
+
+class HashAlgorithm:
+    AHASH = "ahash"  # Pixels brighter than the mean
+    DHASH = "dhash"  # Brightness gradient between neighbouring pixels
+
+
+def image_hash(path, algorithm=HashAlgorithm.DHASH):
+    """64-bit perceptual hash of an image, runs in a worker process"""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img.draft("L", (64, 64))  # Let the JPEG decoder downscale while decoding
+        if algorithm == HashAlgorithm.AHASH:
+            pixels = list(img.convert("L").resize((8, 8), Image.BILINEAR).getdata())
+            mean = sum(pixels) / len(pixels)
+            bits = [p > mean for p in pixels]
+        else:
+            pixels = list(img.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+            bits = [
+                pixels[row * 9 + col] > pixels[row * 9 + col + 1]
+                for row in range(8)
+                for col in range(8)
+            ]
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bit
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance for near-duplicate lookups"""
+
+    def __init__(self):
+        self.root = None  # [hash, items, {distance: child}]
+
+    def add(self, value, item):
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """Items whose hash is within max_distance of value"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.extend(node[1])
+            # Triangle inequality: only these subtrees can hold matches
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class HashIndex:
+    """Persistent perceptual hashes keyed by path, size and mtime"""
+
+    index_name = "preview_hashes.json"
+
+    def __init__(self, root, algorithm):
+        self.root = root
+        self.algorithm = algorithm
+        self.index_path = state_path(root, self.index_name)
+        self.entries = {}  # Path relative to root -> [size, mtime_ns, hash]
+        self.lock = Lock()
+
+    def load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("algorithm") == self.algorithm:
+            self.entries = data.get("hashes", {})
+
+    def get(self, relative_path, stat):
+        entry = self.entries.get(relative_path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return int(entry[2], 16)
+        return None
+
+    def set(self, relative_path, stat, value):
+        with self.lock:
+            self.entries[relative_path] = [
+                stat.st_size,
+                stat.st_mtime_ns,
+                f"{value:016x}",
+            ]
+
+    def save(self, keep):
+        """Write the index, dropping images that no longer exist"""
+        with self.lock:
+            hashes = {k: v for k, v in self.entries.items() if k in keep}
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"algorithm": self.algorithm, "hashes": hashes}, f)
+        os.replace(temp_path, self.index_path)
+
+
+class PreviewDeduplicator:
+    """Find near-duplicate previews across a whole library
+
+    Hashes are computed in a process pool and cached in preview_hashes.json,
+    then grouped with a BK-tree so each lookup only visits nearby hashes.
+    """
+
+    def __init__(
+        self, root, threshold=5, algorithm=HashAlgorithm.DHASH, processes=None
+    ):
+        self.root = root
+        self.threshold = threshold
+        self.algorithm = algorithm
+        self.processes = processes or os.cpu_count() or 1
+        self.index = HashIndex(root, algorithm)
+
+    def list_images(self):
+        """(relative_path, stat) of every preview under root"""
+        images = []
+        stack = [self.root]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIP_DIRS:
+                                stack.append(entry.path)
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                            images.append(
+                                (os.path.relpath(entry.path, self.root), entry.stat())
+                            )
+            except OSError:
+                continue
+        return images
+
+    def hash_images(self, images, on_hashed=None):
+        """Return {relative_path: hash}, computing only what the index lacks"""
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.index.load()
+        hashes = {}
+        missing = []
+        for relative_path, stat in images:
+            value = self.index.get(relative_path, stat)
+            if value is None:
+                missing.append((relative_path, stat))
+            else:
+                hashes[relative_path] = value
+                if on_hashed:
+                    on_hashed(relative_path, True)
+
+        if missing:
+            paths = [os.path.join(self.root, p) for p, _ in missing]
+            with ProcessPoolExecutor(max_workers=self.processes) as executor:
+                results = executor.map(
+                    _safe_hash,
+                    paths,
+                    [self.algorithm] * len(paths),
+                    chunksize=max(1, len(paths) // (self.processes * 8)),
+                )
+                for (relative_path, stat), value in zip(missing, results):
+                    if value is not None:
+                        hashes[relative_path] = value
+                        self.index.set(relative_path, stat, value)
+                    if on_hashed:
+                        on_hashed(relative_path, value is not None)
+
+        self.index.save(keep=hashes)
+        return hashes
+
+    def find_groups(self, hashes):
+        """Lists of relative paths whose hashes are within the threshold"""
+        tree = BKTree()
+        for relative_path, value in hashes.items():
+            tree.add(value, relative_path)
+
+        # Union-find over the matches so chains of near-duplicates form one group
+        parent = {p: p for p in hashes}
+
+        def find(p):
+            while parent[p] != p:
+                parent[p] = parent[parent[p]]
+                p = parent[p]
+            return p
+
+        for relative_path, value in hashes.items():
+            for match in tree.search(value, self.threshold):
+                a, b = find(relative_path), find(match)
+                if a != b:
+                    parent[a] = b
+
+        groups = {}
+        for relative_path in hashes:
+            groups.setdefault(find(relative_path), []).append(relative_path)
+        return [sorted(g) for g in groups.values() if len(g) > 1]
+
+
+def _safe_hash(path, algorithm):
+    try:
+        return image_hash(path, algorithm)
+    except Exception:
+        return None  # Unreadable image, reported as not hashed
+
+
+def split_by_model(group):
+    """Split a near-duplicate group into {model_number: [relative paths]}"""
+    models = {}
+    for relative_path in group:
+        model_number = model_number_of(os.path.basename(relative_path))
+        models.setdefault(model_number, []).append(relative_path)
+    return models
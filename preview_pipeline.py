@@ -0,0 +1,333 @@
+import json
+import os
+import threading
+import time
+
+from image_probe import IMAGE_EXTENSIONS
+from library_state import STATE_DIR_NAME, prepare_state_dir, state_path
+
+FORMATS = {"jpeg": ("JPEG", ".jpeg"), "webp": ("WEBP", ".webp")}
+THUMBNAIL_DIR = "thumbnails"  # Inside the library's bookkeeping folder
+
+
+def source_changed(path, source_stat):
+    """True if path is gone or no longer has the given (size, mtime_ns)"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return True
+    return (stat.st_size, stat.st_mtime_ns) != tuple(source_stat)
+
+
+def transcode_preview(
+    path, source_stat, output_path, fmt, quality, max_edge, thumb_path, thumbnail_size
+):
+    """Recompress one preview and write its thumbnail, runs in a worker process
+
+    The original is only replaced when the result is smaller, and never by a
+    file of another format whose name is already taken. Returns None without
+    writing anything when the preview was removed or replaced since it was
+    submitted (source_stat is its (size, mtime_ns) at that time).
+    """
+    from PIL import Image
+
+    if source_changed(path, source_stat):
+        return None
+    pil_format = FORMATS[fmt][0]
+    before = source_stat[0]
+    temp_path = output_path + ".tmp"
+    thumb_temp_path = thumb_path and thumb_path + ".tmp"
+    with Image.open(path) as img:
+        img.load()
+        width, height = img.size
+        if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        if max_edge and max(img.size) > max_edge:
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        img.save(temp_path, format=pil_format, quality=quality, optimize=True)
+        if thumb_path:
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            thumb = img.copy()
+            thumb.thumbnail((thumbnail_size, thumbnail_size), Image.LANCZOS)
+            thumb.save(thumb_temp_path, format=pil_format, quality=quality)
+
+    # keep_best_preview may have dropped or replaced the preview meanwhile
+    if source_changed(path, source_stat):
+        os.remove(temp_path)
+        if thumb_path:
+            os.remove(thumb_temp_path)
+        return None
+    if thumb_path:
+        os.replace(thumb_temp_path, thumb_path)
+
+    after = os.path.getsize(temp_path)
+    if after >= before or (output_path != path and os.path.exists(output_path)):
+        os.remove(temp_path)  # Already smaller than what we would write
+        output_path, after = path, before
+    else:
+        os.replace(temp_path, output_path)
+        if output_path != path:
+            os.remove(path)
+    return {
+        "path": output_path,
+        "before": before,
+        "after": after,
+        "width": width,
+        "height": height,
+    }
+
+
+class PreviewPipeline:
+    """Recompress previews and build thumbnails in a process pool
+
+    Images are submitted as they land in the library and processed in other
+    processes, so organize workers never wait on Pillow. A manifest in the
+    library's bookkeeping folder records processed images by (size, mtime,
+    settings).
+    """
+
+    manifest_name = "preview_manifest.json"
+
+    def __init__(
+        self,
+        models_root,
+        fmt="jpeg",
+        quality=85,
+        max_edge=1600,
+        thumbnail_size=256,
+        processes=None,
+    ):
+        self.models_root = models_root
+        self.fmt = fmt
+        self.quality = quality
+        self.max_edge = max_edge
+        self.thumbnail_size = thumbnail_size
+        self.processes = processes or os.cpu_count() or 1
+        self.settings = f"{fmt}:{quality}:{max_edge}:{thumbnail_size}"
+        self.manifest_path = state_path(models_root, self.manifest_name)
+        self.manifest = {}  # Path relative to models_root -> entry
+        self.lock = threading.Lock()
+        self.executor = None
+        self.futures = []
+        self.stats = {
+            "processed": 0,
+            "skipped": 0,
+            "errors": 0,
+            "before": 0,
+            "after": 0,
+        }
+
+    def start(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+        self.executor = ProcessPoolExecutor(max_workers=self.processes)
+        return self
+
+    def is_processed(self, path):
+        relative_path = os.path.relpath(path, self.models_root)
+        with self.lock:
+            entry = self.manifest.get(relative_path)
+        if not entry or entry["settings"] != self.settings:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def as_original(self, image):
+        """Rank a probed image by the preview it was made from
+
+        Images written by the pipeline are smaller than the download they
+        replaced, so they are compared by the source's resolution and size
+        instead. Otherwise each run would download and shrink them again.
+        """
+        relative_path = os.path.relpath(image["path"], self.models_root)
+        with self.lock:
+            entry = self.manifest.get(relative_path)
+        source = entry and entry.get("source")
+        if not source or not self.is_processed(image["path"]):
+            return image
+        return dict(image, resolution=source[0] * source[1], size=source[2])
+
+    def submit(self, path):
+        """Queue an image for processing unless the manifest says it is done"""
+        if self.is_processed(path):
+            with self.lock:
+                self.stats["skipped"] += 1
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self.lock:
+                self.stats["errors"] += 1
+            return
+        output_path = os.path.splitext(path)[0] + FORMATS[self.fmt][1]
+        if path.lower().endswith(".jpg") and self.fmt == "jpeg":
+            output_path = path  # Keep .jpg names as they are
+        if output_path != path and os.path.exists(output_path):
+            # Another image already has that name, leave this one alone
+            with self.lock:
+                self.stats["skipped"] += 1
+            return
+        thumb_path = None
+        if self.thumbnail_size:
+            relative_path = os.path.relpath(output_path, self.models_root)
+            thumb_path = state_path(self.models_root, THUMBNAIL_DIR, relative_path)
+        future = self.executor.submit(
+            transcode_preview,
+            path,
+            (stat.st_size, stat.st_mtime_ns),
+            output_path,
+            self.fmt,
+            self.quality,
+            self.max_edge,
+            thumb_path,
+            self.thumbnail_size,
+        )
+        future.add_done_callback(self._done)
+        with self.lock:
+            self.futures.append(future)
+
+    def submit_library(self):
+        """Queue every preview under models_root, returns the number of images found"""
+        found = 0
+        stack = [self.models_root]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name != STATE_DIR_NAME:
+                                stack.append(entry.path)
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                            found += 1
+                            self.submit(entry.path)
+            except OSError:
+                continue
+        return found
+
+    def _done(self, future):
+        try:
+            result = future.result()
+            if result is None:
+                # The preview was removed or replaced before it was written
+                with self.lock:
+                    self.stats["skipped"] += 1
+                return
+            stat = os.stat(result["path"])
+        except Exception:
+            with self.lock:
+                self.stats["errors"] += 1
+            return
+        relative_path = os.path.relpath(result["path"], self.models_root)
+        with self.lock:
+            self.manifest[relative_path] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "settings": self.settings,
+                # Width, height and size of the image before processing
+                "source": [result["width"], result["height"], result["before"]],
+            }
+            self.stats["processed"] += 1
+            self.stats["before"] += result["before"]
+            self.stats["after"] += result["after"]
+
+    def finish(self):
+        """Wait for queued images, save the manifest and return the stats"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        with self.lock:
+            manifest = dict(self.manifest)
+            stats = dict(self.stats)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+        return stats
+
+
+def describe(stats):
+    saved = (stats["before"] - stats["after"]) / (1024 * 1024)
+    return (
+        f"{stats['processed']} processed, {stats['skipped']} already done, "
+        f"{stats['errors']} errors, {saved:.1f} MB saved"
+    )
+
+
+def add_preview_arguments(parser):
+    """Add the shared preview post-processing flags to an argparse parser"""
+    group = parser.add_argument_group("preview optimization")
+    group.add_argument(
+        "--optimize-previews",
+        action="store_true",
+        help="Recompress previews and create thumbnails in a process pool",
+    )
+    group.add_argument(
+        "--preview-format",
+        choices=sorted(FORMATS),
+        default="jpeg",
+        help="(default: jpeg)",
+    )
+    group.add_argument("--preview-quality", type=int, default=85, help="(default: 85)")
+    group.add_argument(
+        "--preview-max-edge",
+        type=int,
+        default=1600,
+        help="Downscale previews to this longest edge, 0 keeps the size "
+        "(default: 1600)",
+    )
+    group.add_argument(
+        "--thumbnail-size",
+        type=int,
+        default=256,
+        help="Thumbnail longest edge, 0 disables thumbnails (default: 256)",
+    )
+    group.add_argument(
+        "--preview-processes", type=int, help="Worker processes (default: one per core)"
+    )
+
+
+def preview_options_from_args(args):
+    """Build SkyFileOrganizer preview_options from parsed arguments"""
+    if not args.optimize_previews:
+        return None
+    return {
+        "fmt": args.preview_format,
+        "quality": args.preview_quality,
+        "max_edge": args.preview_max_edge or None,
+        "thumbnail_size": args.thumbnail_size or None,
+        "processes": args.preview_processes,
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Recompress the previews of an organized 3ds_models library"
+    )
+    parser.add_argument("models_root", help="Path to the 3ds_models folder")
+    add_preview_arguments(parser)
+    args = parser.parse_args()
+    args.optimize_previews = True
+
+    start = time.perf_counter()
+    prepare_state_dir(args.models_root)
+    pipeline = PreviewPipeline(args.models_root, **preview_options_from_args(args))
+    pipeline.start()
+    found = pipeline.submit_library()
+    print(f"🖼️ Found {found} previews, processing on {pipeline.processes} processes...")
+    stats = pipeline.finish()
+    print(f"✅ {describe(stats)} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import io
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class Profiler:
+    """cProfile, tracemalloc and stack sampling around a processing run
+
+    Output files are labeled with the mode, the number of processed files
+    and a timestamp so regressions in one mode can be compared side by side.
+    """
+
+    def __init__(
+        self,
+        output_dir,
+        mode,
+        profile=False,
+        trace_malloc=False,
+        sample_interval=None,
+        top=40,
+    ):
+        self.output_dir = output_dir
+        self.mode = mode
+        self.profile = profile
+        self.trace_malloc = trace_malloc
+        self.sample_interval = sample_interval  # Seconds between stack samples
+        self.top = top
+        self.profilers = []
+        self.profilers_lock = threading.Lock()
+        self.samples = Counter()
+        self.sample_count = 0
+        self.stop_event = threading.Event()
+        self.sampler = None
+
+    def start(self):
+        import cProfile
+        import tracemalloc
+
+        if self.profile:
+            main_profiler = cProfile.Profile()
+            self.profilers.append(main_profiler)
+            if sys.version_info < (3, 12):
+                # cProfile only sees the calling thread, attach one per worker
+                threading.setprofile(self._thread_profile_hook)
+            main_profiler.enable()
+        if self.trace_malloc:
+            tracemalloc.start(10)
+        if self.sample_interval:
+            self.sampler = threading.Thread(
+                target=self._sample, name="StackSampler", daemon=True
+            )
+            self.sampler.start()
+        return self
+
+    def _thread_profile_hook(self, frame, event, arg):
+        import cProfile
+
+        profiler = cProfile.Profile()
+        with self.profilers_lock:
+            self.profilers.append(profiler)
+        profiler.enable()  # Replaces this hook for the rest of the thread
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self.stop_event.wait(self.sample_interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def stop(self, file_count=0):
+        """Stop collecting and write the output files, returns their paths"""
+        import pstats
+        import tracemalloc
+
+        threading.setprofile(None)
+        slug = re.sub(r"[^a-z0-9]+", "_", self.mode.lower()).strip("_")
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(
+            self.output_dir, f"3dsky_profile_{slug}_{file_count}files_{stamp}"
+        )
+        header = f"Mode: {self.mode}\nFiles: {file_count}\n\n"
+        written = []
+
+        if self.profile:
+            for profiler in self.profilers:
+                profiler.disable()
+            with self.profilers_lock:
+                profilers = list(self.profilers)
+            stats = None
+            for profiler in profilers:
+                profiler.create_stats()
+                if not profiler.stats:
+                    continue
+                if stats is None:
+                    stats = pstats.Stats(profiler)
+                else:
+                    stats.add(profiler)
+            if stats is not None:
+                stats.dump_stats(base + ".prof")
+                summary = io.StringIO()
+                stats.stream = summary
+                stats.sort_stats("cumulative").print_stats(self.top)
+                with open(base + ".txt", "w", encoding="utf-8") as f:
+                    f.write(header + summary.getvalue())
+                written += [base + ".prof", base + ".txt"]
+
+        if self.trace_malloc:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(base + "_malloc.txt", "w", encoding="utf-8") as f:
+                f.write(header)
+                f.write(
+                    f"Current: {current / 1024:.1f} KiB, "
+                    f"peak: {peak / 1024:.1f} KiB\n\n"
+                )
+                for stat in snapshot.statistics("lineno")[: self.top]:
+                    f.write(f"{stat}\n")
+            written.append(base + "_malloc.txt")
+
+        if self.sampler:
+            self.stop_event.set()
+            self.sampler.join()
+            # Collapsed stacks, ready for flamegraph.pl or speedscope
+            with open(base + "_samples.txt", "w", encoding="utf-8") as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            written.append(base + "_samples.txt")
+
+        return written
+
+
+def add_profiling_arguments(parser):
+    """Add the shared --profile/--trace-malloc/--sample flags to an argparse parser"""
+    group = parser.add_argument_group("profiling")
+    group.add_argument(
+        "--profile", action="store_true", help="Write cProfile/pstats output"
+    )
+    group.add_argument(
+        "--trace-malloc",
+        action="store_true",
+        help="Write the top allocation sites at the end of the run",
+    )
+    group.add_argument(
+        "--sample",
+        type=float,
+        metavar="MS",
+        help="Sample all thread stacks every MS milliseconds",
+    )
+
+
+def profile_options_from_args(args):
+    """Build SkyFileOrganizer profile_options from parsed arguments"""
+    if not (args.profile or args.trace_malloc or args.sample):
+        return None
+    return {
+        "profile": args.profile,
+        "trace_malloc": args.trace_malloc,
+        "sample_interval": args.sample / 1000 if args.sample else None,
+    }
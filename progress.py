@@ -0,0 +1,219 @@
+import json
+import sys
+import threading
+import time
+from collections import deque
+from threading import Lock
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressBus:
+    """Aggregates progress events from any thread and publishes throttled snapshots
+
+    Workers call advance()/api_request(), which only update counters under a
+    lock. Sinks receive a snapshot dict at most max_rate times per second from
+    a publisher thread, the GUI can also poll snapshot() from its own loop.
+    """
+
+    def __init__(self, sinks=None, max_rate=4, window=10):
+        self.sinks = list(sinks or [])
+        self.max_rate = max_rate
+        self.window = window  # Seconds of history used for rates and ETA
+        self.lock = Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.budget = None  # Optional throttle.DownloadBudget shown in snapshots
+        self.reset()
+
+    def reset(self, total=0, total_bytes=0, label=""):
+        with self.lock:
+            self.label = label
+            self.total = total
+            self.total_bytes = total_bytes
+            self.current = 0
+            self.bytes_done = 0
+            self.api_requests = 0
+            self.status = ""
+            self.finished = False
+            self.started_at = time.monotonic()
+            self.download_base = self.budget.transferred if self.budget else 0
+            self.downloaded = 0
+            self.samples = deque([(self.started_at, 0, 0, 0, 0)])
+            self.version = 0
+
+    def start(self, total=0, total_bytes=0, label=""):
+        """Begin a new run and start publishing to the sinks"""
+        self.reset(total, total_bytes, label)
+        if self.sinks and self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(
+                target=self._publisher, name="ProgressPublisher", daemon=True
+            )
+            self.thread.start()
+
+    def attach_budget(self, budget):
+        """Report download rate, limit and connections of a DownloadBudget"""
+        with self.lock:
+            self.budget = budget
+            self.download_base = budget.transferred if budget else 0
+            self.downloaded = 0
+            self.samples = deque(s[:4] + (0,) for s in self.samples)
+
+    def set_total(self, total, total_bytes=None):
+        with self.lock:
+            self.total = total
+            if total_bytes is not None:
+                self.total_bytes = total_bytes
+            self.version += 1
+
+    def advance(self, files=1, nbytes=0, status=None):
+        with self.lock:
+            self.current += files
+            self.bytes_done += nbytes
+            if status is not None:
+                self.status = status
+            self.version += 1
+
+    def update_status(self, status):
+        with self.lock:
+            self.status = status
+            self.version += 1
+
+    def api_request(self):
+        with self.lock:
+            self.api_requests += 1
+            self.version += 1
+
+    def finish(self, status=None):
+        """Mark the run complete and publish the final snapshot"""
+        with self.lock:
+            if status is not None:
+                self.status = status
+            if self.total < self.current:
+                self.total = self.current
+            self.finished = True
+            self.version += 1
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+        self._publish(self.snapshot())
+
+    def snapshot(self):
+        """Current counters with throughput and ETA over the recent window"""
+        now = time.monotonic()
+        budget = self.budget.snapshot() if self.budget else None
+        with self.lock:
+            if budget:
+                downloaded = budget["transferred"] - self.download_base
+                if downloaded != self.downloaded:
+                    self.downloaded = downloaded
+                    self.version += 1  # Downloads move without files finishing
+            self.samples.append(
+                (now, self.current, self.bytes_done, self.api_requests, self.downloaded)
+            )
+            while len(self.samples) > 2 and now - self.samples[1][0] >= self.window:
+                self.samples.popleft()
+            first = self.samples[0]
+            elapsed = max(now - first[0], 1e-6)
+            files_per_sec = (self.current - first[1]) / elapsed
+            bytes_per_sec = (self.bytes_done - first[2]) / elapsed
+            api_per_sec = (self.api_requests - first[3]) / elapsed
+            download_per_sec = (self.downloaded - first[4]) / elapsed
+
+            eta = None
+            if self.finished:
+                eta = 0
+            elif self.total_bytes and bytes_per_sec > 0:
+                eta = (self.total_bytes - self.bytes_done) / bytes_per_sec
+            elif self.total and files_per_sec > 0:
+                eta = (self.total - self.current) / files_per_sec
+
+            return {
+                "label": self.label,
+                "current": self.current,
+                "total": self.total,
+                "bytes": self.bytes_done,
+                "total_bytes": self.total_bytes,
+                "api_requests": self.api_requests,
+                "status": self.status,
+                "files_per_sec": files_per_sec,
+                "mb_per_sec": bytes_per_sec / (1024 * 1024),
+                "api_per_sec": api_per_sec,
+                "download_mb_per_sec": download_per_sec / (1024 * 1024),
+                "download_limit_mb": (
+                    budget["limit"] / (1024 * 1024)
+                    if budget and budget["limit"]
+                    else None
+                ),
+                "connections": budget["active"] if budget else {},
+                "eta": eta,
+                "elapsed": now - self.started_at,
+                "finished": self.finished,
+                "version": self.version,
+            }
+
+    def _publisher(self):
+        interval = 1.0 / self.max_rate
+        last_version = -1
+        while not self.stop_event.wait(interval):
+            snapshot = self.snapshot()
+            if snapshot["version"] != last_version:
+                last_version = snapshot["version"]
+                self._publish(snapshot)
+
+    def _publish(self, snapshot):
+        for sink in self.sinks:
+            try:
+                sink(snapshot)
+            except Exception:
+                pass  # A broken sink must never stop the workers
+
+
+def describe(snapshot):
+    """One line human readable summary of a snapshot"""
+    text = f"Processed {snapshot['current']} of {snapshot['total']} files"
+    text += f" · {snapshot['files_per_sec']:.1f} files/s"
+    if snapshot["bytes"]:
+        text += f" · {snapshot['mb_per_sec']:.1f} MB/s"
+    if snapshot["api_requests"]:
+        text += f" · {snapshot['api_per_sec']:.1f} API req/s"
+    if snapshot.get("download_limit_mb"):
+        text += (
+            f" · ↓ {snapshot['download_mb_per_sec']:.1f}"
+            f"/{snapshot['download_limit_mb']:.1f} MB/s"
+        )
+    elif snapshot.get("download_mb_per_sec"):
+        text += f" · ↓ {snapshot['download_mb_per_sec']:.1f} MB/s"
+    if snapshot.get("connections"):
+        text += f" · {sum(snapshot['connections'].values())} connections"
+    text += f" · ETA {format_eta(snapshot['eta'])}"
+    return text
+
+
+class ConsoleProgressSink:
+    """Print progress lines to a stream, stderr by default"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+
+    def __call__(self, snapshot):
+        self.stream.write(f"[{snapshot['label']}] {describe(snapshot)}\n")
+        self.stream.flush()
+
+
+class JsonProgressSink:
+    """Append progress snapshots to a file as JSON lines"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, snapshot):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(snapshot) + "\n")
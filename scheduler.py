@@ -0,0 +1,76 @@
+from collections import deque
+
+from image_probe import model_number_of
+
+# Upper bounds of the small and medium size classes, larger files are "large"
+SIZE_CLASSES = (64 * 1024 * 1024, 1024 * 1024 * 1024)
+
+
+class ScheduleStrategy:
+    FIFO = "fifo"  # Directory listing order
+    FAST_FEEDBACK = "fast-feedback"  # Local work first, then sizes interleaved
+    LARGEST_FIRST = "largest-first"  # Long transfers start early, fewer stragglers
+    SMALLEST_FIRST = "smallest-first"
+
+    ALL = [FIFO, FAST_FEEDBACK, LARGEST_FIRST, SMALLEST_FIRST]
+
+
+STRATEGY_DESCRIPTIONS = {
+    ScheduleStrategy.FIFO: "Files in the order the folder lists them",
+    ScheduleStrategy.FAST_FEEDBACK: (
+        "Files needing no API lookup first, then small and large files interleaved"
+    ),
+    ScheduleStrategy.LARGEST_FIRST: (
+        "Biggest archives first so no large transfer is left for the end"
+    ),
+    ScheduleStrategy.SMALLEST_FIRST: (
+        "Smallest archives first for the most files per minute early on"
+    ),
+}
+
+
+def size_class(size):
+    for index, limit in enumerate(SIZE_CLASSES):
+        if size < limit:
+            return index
+    return len(SIZE_CLASSES)
+
+
+def schedule(items, strategy=ScheduleStrategy.FIFO):
+    """Order (filename, size, local) work items, returns lists of filenames
+
+    Except with fifo, files sharing a model number form one list and a single
+    worker handles them back to back. Copies of the same file ID (`x (1).zip`)
+    then find the first one in the library instead of racing it to the API;
+    siblings with another ID still get their own lookup.
+    """
+    if strategy == ScheduleStrategy.FIFO:
+        return [[filename] for filename, _, _ in items]
+
+    groups = {}
+    for item in items:
+        groups.setdefault(model_number_of(item[0]) or item[0], []).append(item)
+    # A group is local only if none of its files needs the API
+    groups = [
+        (all(local for _, _, local in group), sum(size for _, size, _ in group), group)
+        for group in groups.values()
+    ]
+
+    if strategy == ScheduleStrategy.LARGEST_FIRST:
+        groups.sort(key=lambda g: g[1], reverse=True)
+    elif strategy == ScheduleStrategy.SMALLEST_FIRST:
+        groups.sort(key=lambda g: g[1])
+    else:  # FAST_FEEDBACK
+        local = sorted((g for g in groups if g[0]), key=lambda g: g[1])
+        # Round-robin over size classes so a huge archive never holds up the small ones
+        classes = [deque() for _ in range(len(SIZE_CLASSES) + 1)]
+        for group in sorted((g for g in groups if not g[0]), key=lambda g: g[1]):
+            classes[size_class(group[1])].append(group)
+        interleaved = []
+        while any(classes):
+            for size_group in classes:
+                if size_group:
+                    interleaved.append(size_group.popleft())
+        groups = local + interleaved
+
+    return [[filename for filename, _, _ in group] for _, _, group in groups]
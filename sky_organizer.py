@@ -0,0 +1,1790 @@
+import io
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from threading import Lock
+
+from archive_probe import find_preview, infer_file_id, list_members, read_member
+from archive_verify import ArchiveVerifier
+from category_paths import CategoryPathCache
+from failure_log import FailureLog, FailureStage, compact
+from file_transfer import TransferEngine
+from image_probe import (
+    IMAGE_EXTENSIONS,
+    ImageProbeCache,
+    PreviewFolderIndex,
+    image_rank,
+    model_number_of,
+    probe_bytes,
+    probe_dimensions,
+    read_dimensions,
+)
+from instrumentation import Metrics, timed
+from library_index import ARCHIVE_EXTENSIONS, LibraryIndex
+from library_state import STATE_DIR_NAME, prepare_state_dir, state_path, walk_library
+from log_setup import log_manager
+from negative_cache import MissReason, NegativeCache
+from preview_cache import CacheStatus, PreviewCache
+from preview_dedup import PreviewDeduplicator, split_by_model
+from preview_pipeline import PreviewPipeline
+from preview_pipeline import describe as describe_previews
+from profiling import Profiler
+from progress import ProgressBus
+from scheduler import ScheduleStrategy, schedule
+from throttle import DownloadBudget, RateLimiter
+from watcher import FolderWatcher
+from work_lease import LeaseDirectory
+
+
+class DuplicatePolicy:
+    MOVE_TO_DUPLICATES = "duplicates"
+    SKIP = "skip"
+    PROCESS = "process"
+
+    @staticmethod
+    def get_label(policy: str) -> str:
+        labels = {
+            DuplicatePolicy.MOVE_TO_DUPLICATES: "Move to Duplicates folder",
+            DuplicatePolicy.SKIP: "Leave in source folder",
+            DuplicatePolicy.PROCESS: "Organize again (API lookup)",
+        }
+        return labels.get(policy, "")
+
+
+class ProcessingMode:
+    FILE_ORGANIZER = "File Organizer"
+    FOLDER_MERGER = "Folder Merger"
+    FILE_COLLECTOR = "File Collector"
+    DUPLICATE_FIXER = "Duplicate Fixer"
+    REMOVE_NUMBER = "Remove (Number)"
+    SINGLE_FOLDER = "Single Folder"
+    PREVIEW_DEDUP = "Preview Dedup"
+
+    @staticmethod
+    def get_tooltip(mode: str) -> str:
+        tooltips = {
+            ProcessingMode.FILE_ORGANIZER: "Organizes individual 3DSky files into categorized folders",
+            ProcessingMode.FOLDER_MERGER: "Merges two pre-organized 3DSky folders while updating folder summaries",
+            ProcessingMode.FILE_COLLECTOR: "Collects all zip and image files from source directory and its subdirectories",
+            ProcessingMode.DUPLICATE_FIXER: "Finds and fixes duplicate files by keeping the largest version and cleaning up names",
+            ProcessingMode.REMOVE_NUMBER: "Remove number from file name, Run this after Duplicate Fixer",
+            ProcessingMode.SINGLE_FOLDER: "Copy/Move a structured folder's files into a single destination folder",
+            ProcessingMode.PREVIEW_DEDUP: "Finds visually identical previews across the whole library and sets aside extra copies of the same model",
+        }
+        return tooltips.get(mode, "")
+
+
+@dataclass
+class OrganizerOptions:
+    """Settings of a SkyFileOrganizer, the defaults match the GUI"""
+
+    max_workers: int = 5
+    download_previews: bool = True
+    duplicate_policy: str = DuplicatePolicy.MOVE_TO_DUPLICATES
+    rescan_library: bool = False
+    retry_not_found: bool = False
+    prometheus_textfile: str = None
+    profile_options: dict = None  # Profiler keyword arguments, see profiling.py
+    api_delay: float = 1  # Seconds a worker waits after each API lookup
+    api_rate_limit: float = None  # API requests per second for all workers
+    json_logs: bool = False
+    inspect_archives: bool = True
+    verify_archives: bool = False
+    verify_bytes_per_sec: float = None
+    preview_cache: bool = True
+    preview_cache_dir: str = None
+    preview_options: dict = None  # PreviewPipeline keyword arguments
+    watch_options: dict = None  # SkyFileOrganizer.watch keyword arguments
+    shard: str = None
+    lease_ttl: float = 120
+    verify_copies: bool = False
+    schedule_strategy: str = ScheduleStrategy.FAST_FEEDBACK
+    bandwidth_options: dict = None  # See throttle.bandwidth_options_from_args
+
+
+class SkyFileOrganizer:
+    def __init__(
+        self,
+        source_directory=None,
+        destination_directory=None,
+        options=None,
+        progress=None,
+    ):
+        options = options or OrganizerOptions()
+        self.source_directory = source_directory
+        self.destination_directory = destination_directory
+        self.max_workers = options.max_workers
+        self.models_root = None
+        self.api_url = "https://3dsky.org/api/models"
+        self.image_base_url = (
+            "https://b6.3ddd.ru/media/cache/tuk_model_custom_filter_ang_en/"
+        )
+        self.not_found_log = "not_found_models.json"
+        self.failure_log_name = "not_found_models.ndjson"
+        self.failure_log = None
+        self.print_lock = Lock()  # Lock for thread-safe printing
+        self.processing_queue = queue.Queue()
+        self.processed_count = 0  # Add counter for processed files
+        self.total_files = 0  # Add total files counter
+        self.counter_lock = Lock()  # Add lock for thread-safe counting
+        self.threads = []
+        self.download_previews = options.download_previews
+        self.duplicate_policy = options.duplicate_policy
+        self.rescan_library = options.rescan_library
+        self.library_index = None
+        self.retry_not_found = options.retry_not_found
+        self.negative_cache = None
+        self.image_probe = ImageProbeCache()
+        self.preview_index = PreviewFolderIndex()
+        self.category_paths = CategoryPathCache()
+        # Previews up to this size are downloaded to memory before deciding to keep them
+        self.preview_memory_limit = 16 * 1024 * 1024
+        # Downloaded previews are kept per URL and shared by every library
+        self.use_preview_cache = options.preview_cache
+        self.preview_cache_dir = options.preview_cache_dir
+        self.preview_cache = None
+        self.preview_cache_max_bytes = 2 * 1024 * 1024 * 1024
+        # Recover IDs and previews from member names of badly named archives
+        self.inspect_archives = options.inspect_archives
+        self.embedded_preview_min_edge = 800
+        # Optional CRC check of incoming archives in a process pool
+        self.verify_archives = options.verify_archives
+        self.verify_bytes_per_sec = options.verify_bytes_per_sec
+        self.archive_verifier = None
+        # Optional recompression and thumbnails, run in a process pool
+        self.preview_options = options.preview_options
+        self.preview_pipeline = None
+        # Keep organizing new archives until stop_event is set, see watch()
+        self.watch_options = options.watch_options
+        self.stop_event = threading.Event()
+        # Processes started with the same shard name split the source files
+        self.shard = options.shard
+        self.lease_ttl = options.lease_ttl
+        self.leases = None
+        # Moves across devices are copied in chunks, optionally hash verified
+        self.transfers = TransferEngine(verify=options.verify_copies)
+        # Order of the File Organizer queue, see scheduler.ScheduleStrategy
+        self.schedule_strategy = options.schedule_strategy
+        self.api_delay = options.api_delay
+        # Optional cap on API requests per second shared by all workers
+        self.api_limiter = (
+            RateLimiter(options.api_rate_limit) if options.api_rate_limit else None
+        )
+        # Connection limits per host and a bytes/sec budget for downloads
+        self.bandwidth_options = options.bandwidth_options or {}
+        self.download_budget = DownloadBudget()
+        self.progress = progress or ProgressBus()
+        self.metrics = Metrics()
+        self.run_report_name = "3dsky_run_report.json"
+        self.prometheus_textfile = options.prometheus_textfile
+        self.profile_options = options.profile_options
+        self.json_logs = options.json_logs
+        self.run_log_dir_name = "3dsky_logs"
+        self.setup_logging()
+
+    def safe_print(self, *args, **kwargs):
+        """Thread-safe printing"""
+        with self.print_lock:
+            print(*args, **kwargs)
+
+    def run(self, mode, operation="move"):
+        """Run a processing mode, write its run report and return it"""
+        self.metrics.reset()
+        self.transfers.reset()
+        report_dir = self.report_directory()
+        try:
+            os.makedirs(report_dir, exist_ok=True)
+            log_manager.start_run(
+                os.path.join(report_dir, self.run_log_dir_name),
+                mode,
+                json_format=self.json_logs,
+            )
+        except OSError as e:
+            self.safe_print(f"⚠️ Error creating run log: {str(e)}")
+        profiler = None
+        if self.profile_options:
+            profiler = Profiler(report_dir, mode, **self.profile_options)
+            profiler.start()
+        try:
+            if mode == ProcessingMode.DUPLICATE_FIXER:
+                self.fix_duplicates()
+            elif mode == ProcessingMode.REMOVE_NUMBER:
+                self.remove_numbers()
+            elif mode == ProcessingMode.FILE_ORGANIZER:
+                if self.watch_options is not None:
+                    self.watch(**self.watch_options)
+                else:
+                    self.process_files()
+            elif mode == ProcessingMode.FOLDER_MERGER:
+                self.merge_folders(operation=operation)
+            elif mode == ProcessingMode.SINGLE_FOLDER:
+                self.single_folder_operation(operation=operation)
+            elif mode == ProcessingMode.PREVIEW_DEDUP:
+                self.dedupe_previews()
+            else:  # FILE_COLLECTOR
+                self.collect_files()
+        finally:
+            # Make the folders of cross-device copies durable
+            self.transfers.flush()
+            for pair, stats in self.transfers.report().items():
+                self.safe_print(
+                    f"🚚 Devices {pair}: {stats['files']} files copied at "
+                    f"{stats['mb_per_sec']} MB/s"
+                )
+            if profiler:
+                file_count = self.progress.snapshot()["current"]
+                for path in profiler.stop(file_count):
+                    self.safe_print(f"🔬 Profile written: {path}")
+            report = self.write_run_report(mode)
+            log_manager.end_run()
+        return report
+
+    def report_directory(self):
+        """Directory receiving run reports, run logs and profiles
+
+        It is the bookkeeping folder skipped by every walk, so modes that work
+        in place on the source directory never pick up their own output.
+        """
+        return state_path(self.destination_directory or self.source_directory)
+
+    def write_run_report(self, mode):
+        """Write per-stage timings as JSON and optionally as a Prometheus textfile"""
+        report_dir = self.report_directory()
+        snapshot = self.progress.snapshot()
+        extra = {
+            "files": snapshot["current"],
+            "total_files": snapshot["total"],
+            "bytes": snapshot["bytes"],
+            "api_requests": snapshot["api_requests"],
+            "device_pairs": self.transfers.report(),
+        }
+        report = self.metrics.report(mode, extra)
+        try:
+            report_path = os.path.join(report_dir, self.run_report_name)
+            self.metrics.write_report(report_path, mode, extra)
+            self.logger.info(f"Wrote run report to {report_path}")
+            if self.prometheus_textfile:
+                self.metrics.write_prometheus(self.prometheus_textfile, mode)
+        except Exception as e:
+            self.safe_print(f"⚠️ Error writing run report: {str(e)}")
+            self.logger.error(f"Error writing run report: {str(e)}")
+        return report
+
+    def transfer_file(self, source_path, dest_path, operation="move", replace=False):
+        """Move or copy a file, recording its latency and size"""
+        with self.metrics.time(operation) as timing:
+            timing.nbytes = self.transfers.transfer(
+                source_path, dest_path, operation, replace=replace
+            )
+        return timing.nbytes
+
+    def setup_logging(self):
+        """Log through a queue so workers never block on file writes"""
+        self.logger = log_manager.configure(json_format=self.json_logs)
+
+    def merge_folders(self, operation="move"):
+        """Merge pre-organized folders from source to destination"""
+        source_dir, dest_dir = self.get_directories()
+
+        if not os.path.exists(os.path.join(source_dir, "3ds_models")):
+            self.safe_print("❌ Source directory does not contain a 3ds_models folder")
+            return
+
+        source_models_dir = os.path.join(source_dir, "3ds_models")
+        dest_models_dir = os.path.join(dest_dir, "3ds_models")
+
+        if not os.path.exists(dest_models_dir):
+            os.makedirs(dest_models_dir)
+
+        self.safe_print(f"\n🔄 Starting folder {operation} process...")
+
+        # Count total files first
+        source_files = [
+            os.path.join(root, file)
+            for root, _, files in walk_library(source_models_dir)
+            for file in files
+            if file != "folder_summary.json"
+        ]
+        total_files = len(source_files)
+        self.progress.start(total_files, label=ProcessingMode.FOLDER_MERGER)
+
+        if self.verify_archives:
+            prepare_state_dir(dest_models_dir)
+            failure_log_path = state_path(dest_models_dir, self.failure_log_name)
+            self.failure_log = FailureLog(failure_log_path).start()
+            # Files already at the destination are skipped, not verified
+            self.start_archive_verifier(
+                state_path(dest_models_dir),
+                [
+                    p
+                    for p in source_files
+                    if p.lower().endswith(ARCHIVE_EXTENSIONS)
+                    and not os.path.exists(
+                        os.path.join(
+                            dest_models_dir, os.path.relpath(p, source_models_dir)
+                        )
+                    )
+                ],
+            )
+
+        # Walk through all categories in source
+        summary_dirs = set()
+        for root, dirs, files in walk_library(source_models_dir):
+            relative_path = os.path.relpath(root, source_models_dir)
+            dest_path = os.path.join(dest_models_dir, relative_path)
+
+            # Create destination directory if it doesn't exist
+            if not os.path.exists(dest_path):
+                os.makedirs(dest_path)
+                self.safe_print(f"📁 Created directory: {relative_path}")
+
+            # First, remove any existing summary files
+            summary_path = os.path.join(root, "folder_summary.json")
+            if os.path.exists(summary_path):
+                try:
+                    os.remove(summary_path)
+                    summary_dirs.add(root)
+                    self.safe_print(
+                        f"🗑️ Removed old summary file from: {relative_path}"
+                    )
+                except Exception as e:
+                    self.safe_print(f"❌ Error removing summary file: {str(e)}")
+
+            # Move/copy all files
+            for file in files:
+                if file == "folder_summary.json":
+                    continue
+
+                self.progress.update_status(f"{operation.capitalize()}ing: {file}")
+
+                source_file = os.path.join(root, file)
+                dest_file = os.path.join(dest_path, file)
+
+                if os.path.exists(dest_file):
+                    self.safe_print(f"⚠️ File already exists, skipping: {file}")
+                    self.progress.advance()
+                    continue
+
+                if (
+                    self.archive_verifier is not None
+                    and file.lower().endswith(ARCHIVE_EXTENSIONS)
+                    and not self.check_archive(source_file, source_dir, operation)
+                ):
+                    self.progress.advance()
+                    continue
+
+                size = 0
+                try:
+                    size = self.transfer_file(source_file, dest_file, operation)
+                    self.safe_print(f"✅ {operation.capitalize()}d: {file}")
+                except Exception as e:
+                    self.safe_print(f"❌ Error {operation}ing {file}: {str(e)}")
+                self.progress.advance(nbytes=size)
+
+            # Update folder summary for current directory
+            self.update_folder_summary(dest_path)
+
+        if self.archive_verifier is not None:
+            self.close_archive_verifier()
+            self.failure_log.close()
+            if self.failure_log.count:
+                compact(
+                    self.failure_log.path,
+                    os.path.join(dest_models_dir, self.not_found_log),
+                    since=self.failure_log.started,
+                )
+
+        # The destination library changed, force a rescan on the next organize run
+        LibraryIndex.invalidate(dest_models_dir)
+
+        # Clean up empty directories in source if moving
+        if operation == "move":
+            self.transfers.flush()
+            with self.metrics.time("cleanup"):
+                self.cleanup_empty_dirs(
+                    source_models_dir, self.transfers.take_touched() | summary_dirs
+                )
+
+        # Update all folder summaries from bottom up
+        self.update_all_folder_summaries(dest_models_dir)
+
+        # Update progress to complete
+        self.progress.finish("Folder merge complete!")
+
+        self.safe_print(f"\n✨ Folder {operation} complete!")
+
+    def collect_files(self):
+        """Collect all zip and image files from source directory and its subdirectories"""
+        source_dir, dest_dir = self.get_directories()
+
+        if not os.path.exists(dest_dir):
+            os.makedirs(dest_dir)
+
+        self.safe_print("\n🔍 Starting file collection process...")
+
+        # Supported file extensions
+        supported_extensions = {".zip", ".rar", ".7z", *IMAGE_EXTENSIONS}
+
+        # First, count total files to process
+        total_files = sum(
+            1
+            for root, _, files in walk_library(source_dir)
+            for file in files
+            if os.path.splitext(file)[1].lower() in supported_extensions
+        )
+        self.progress.start(total_files, label=ProcessingMode.FILE_COLLECTOR)
+
+        # Walk through all subdirectories
+        for root, _, files in walk_library(source_dir):
+            for file in files:
+                ext = os.path.splitext(file)[1].lower()
+                if ext in supported_extensions:
+                    self.progress.update_status(f"Collecting: {file}")
+
+                    source_file = os.path.join(root, file)
+                    dest_file = os.path.join(dest_dir, file)
+
+                    # Handle duplicate filenames
+                    if os.path.exists(dest_file):
+                        base, ext = os.path.splitext(file)
+                        counter = 1
+                        while os.path.exists(dest_file):
+                            dest_file = os.path.join(dest_dir, f"{base}_{counter}{ext}")
+                            counter += 1
+
+                    size = 0
+                    try:
+                        size = self.transfer_file(source_file, dest_file, "copy")
+                        self.safe_print(f"✅ Copied: {file}")
+                    except Exception as e:
+                        self.safe_print(f"❌ Error copying {file}: {str(e)}")
+                    self.progress.advance(nbytes=size)
+
+        # Update progress to complete
+        self.progress.finish("File collection complete!")
+
+        self.safe_print("\n✨ File collection complete!")
+
+    def start_archive_verifier(self, cache_dir, archive_paths):
+        """Start verifying archives in the background"""
+        self.safe_print(f"🧪 Verifying {len(archive_paths)} archives in the background")
+        self.archive_verifier = ArchiveVerifier(
+            cache_dir, bytes_per_sec=self.verify_bytes_per_sec
+        ).start(archive_paths)
+
+    def close_archive_verifier(self):
+        try:
+            self.archive_verifier.close()
+        except OSError as e:
+            self.safe_print(f"⚠️ Error saving verification cache: {str(e)}")
+        self.archive_verifier = None
+
+    def check_archive(self, archive_path, quarantine_root, operation="move"):
+        """Wait for an archive's verification, returns False if it is corrupt
+
+        Corrupt archives are moved to a Quarantine folder in quarantine_root
+        when files are being moved, and left in place when copying.
+        """
+        with self.metrics.time("verify_wait"):
+            ok, message = self.archive_verifier.result(archive_path)
+        if ok:
+            return True
+
+        filename = os.path.basename(archive_path)
+        self.safe_print(f"🚫 Corrupt archive {filename}: {message}")
+        self.logger.error(f"Corrupt archive {archive_path}: {message}")
+        self.metrics.error("verify", "corrupt")
+        self.record_failure(filename, "corrupt_archive", message, FailureStage.VERIFY)
+        if operation != "move":
+            return False
+
+        quarantine_folder = os.path.join(quarantine_root, "Quarantine")
+        os.makedirs(quarantine_folder, exist_ok=True)
+        dest_path = os.path.join(quarantine_folder, filename)
+        base, ext = os.path.splitext(filename)
+        counter = 1
+        while os.path.exists(dest_path):
+            dest_path = os.path.join(quarantine_folder, f"{base}_{counter}{ext}")
+            counter += 1
+        try:
+            self.transfer_file(archive_path, dest_path)
+            self.safe_print(f"🚫 Moved to Quarantine: {os.path.basename(dest_path)}")
+        except Exception as e:
+            self.safe_print(f"❌ Error quarantining {filename}: {str(e)}")
+            self.logger.error(f"Error quarantining {filename}: {str(e)}")
+        return False
+
+    def cleanup_empty_dirs(self, directory, touched=None):
+        """Remove empty directories
+
+        With touched, only those folders and their parents up to directory are
+        tried, instead of walking the whole tree.
+        """
+        if touched is not None:
+            self.prune_touched_dirs(directory, touched)
+            return
+        for root, dirs, files in walk_library(directory, topdown=False):
+            for dir_name in dirs:
+                dir_path = os.path.join(root, dir_name)
+                try:
+                    os.rmdir(dir_path)
+                    self.safe_print(f"🗑️ Removed empty directory: {dir_path}")
+                except OSError:
+                    # Directory not empty, skip it
+                    pass
+
+        # Try to remove the root directory itself if empty
+        try:
+            os.rmdir(directory)
+            self.safe_print(f"🗑️ Removed empty root directory: {directory}")
+        except OSError:
+            pass
+
+    def prune_touched_dirs(self, directory, touched):
+        """Remove emptied folders deepest first, walking up while parents empty out"""
+        directory = os.path.abspath(directory)
+        tried = set()
+        for path in sorted(
+            (os.path.abspath(p) for p in touched),
+            key=lambda p: p.count(os.sep),
+            reverse=True,
+        ):
+            while path not in tried and (
+                path == directory or path.startswith(directory + os.sep)
+            ):
+                tried.add(path)
+                try:
+                    os.rmdir(path)
+                except OSError:
+                    break  # Not empty, so neither are its parents
+                if path == directory:
+                    self.safe_print(f"🗑️ Removed empty root directory: {directory}")
+                    break
+                self.safe_print(f"🗑️ Removed empty directory: {path}")
+                path = os.path.dirname(path)
+
+    def update_all_folder_summaries(self, start_path):
+        """Update folder summaries for all directories from bottom up"""
+        for root, dirs, files in walk_library(start_path, topdown=False):
+            self.update_folder_summary(root)
+
+    def process_files(self):
+        """Process all files using multiple threads"""
+        source_dir, dest_dir = self.get_directories()
+        if not os.path.exists(source_dir):
+            self.safe_print(f"❌ Error: Source directory {source_dir} does not exist")
+            self.logger.error(f"Source directory {source_dir} does not exist")
+            return
+        if not os.path.exists(dest_dir):
+            self.safe_print(
+                f"❌ Error: Destination directory {dest_dir} does not exist"
+            )
+            self.logger.error(f"Destination directory {dest_dir} does not exist")
+            return
+
+        # Get all compressed files
+        compressed_files = [
+            f
+            for f in os.listdir(source_dir)
+            if f.lower().endswith((".zip", ".rar", ".7z"))
+        ]
+
+        # Cached misses are skipped until they expire
+        self.negative_cache = NegativeCache(self.models_root)
+        self.negative_cache.load()
+        if self.retry_not_found:
+            compressed_files = [
+                f
+                for f in compressed_files
+                if self.extract_file_id(f) in self.negative_cache
+            ]
+            self.safe_print(
+                f"🔁 Retrying {len(compressed_files)} previously not found files"
+            )
+
+        self.total_files = len(compressed_files)
+        self.safe_print(f"\n🔍 Found {self.total_files} compressed files to process")
+        total_bytes = 0
+        for filename in compressed_files:
+            try:
+                total_bytes += os.path.getsize(os.path.join(source_dir, filename))
+            except OSError:
+                pass
+        self.progress.start(
+            self.total_files, total_bytes, label=ProcessingMode.FILE_ORGANIZER
+        )
+
+        self.start_organizing()
+        try:
+            self.process_batch(compressed_files)
+        finally:
+            self.finish_organizing()
+
+        # Update root directory summary
+        self.update_folder_summary(self.models_root)
+        self.progress.finish("Processing complete!")
+        self.safe_print("\n✨ Processing complete!")
+
+    def start_organizing(self):
+        """Load the library state shared by every File Organizer batch"""
+        # Index file IDs already organized so re-downloads skip the API
+        if self.duplicate_policy != DuplicatePolicy.PROCESS:
+            self.library_index = LibraryIndex(self.models_root, self.extract_file_id)
+            source = self.library_index.load_or_scan(rescan=self.rescan_library)
+            self.safe_print(
+                f"📚 Library index ready ({source}): {len(self.library_index)} files"
+            )
+
+        self.download_budget = self.build_download_budget()
+        self.progress.attach_budget(self.download_budget)
+
+        # Category folders are listed again on first use in this run
+        self.preview_index.clear()
+        # Folders of indexed files that are still on disk need no mkdir later
+        self.category_paths.clear()
+        if self.library_index is not None:
+            self.category_paths.mark_existing(
+                self.models_root, self.library_index.folders()
+            )
+        if self.download_previews and self.use_preview_cache:
+            try:
+                self.preview_cache = PreviewCache(
+                    self.preview_cache_dir, budget=self.download_budget
+                )
+            except OSError as e:
+                self.safe_print(f"⚠️ Preview cache disabled: {str(e)}")
+                self.preview_cache = None
+        if self.preview_options is not None:
+            self.preview_pipeline = PreviewPipeline(
+                self.models_root, **self.preview_options
+            ).start()
+
+        # Failures are streamed to disk as they happen
+        failure_log_path = state_path(self.models_root, self.failure_log_name)
+        if self.shard:
+            self.leases = LeaseDirectory(
+                self.models_root, self.shard, ttl=self.lease_ttl
+            ).start()
+            self.safe_print(
+                f"🤝 Sharing shard '{self.shard}' as worker {self.leases.worker_id}"
+            )
+            # One log per process, appends from several hosts could interleave
+            failure_log_dir = os.path.join(self.leases.shard_dir, "failures")
+            os.makedirs(failure_log_dir, exist_ok=True)
+            failure_log_path = os.path.join(
+                failure_log_dir, f"{self.leases.worker_id}.ndjson"
+            )
+        self.failure_log = FailureLog(failure_log_path).start()
+
+    def is_local_work(self, filename):
+        """True if a file can be handled without querying the API"""
+        file_id = self.extract_file_id(filename)
+        if not file_id:
+            # Archive inspection may recover an ID that then needs a lookup
+            return not self.inspect_archives
+        if self.library_index is not None and self.library_index.lookup(file_id):
+            return True
+        return (
+            self.negative_cache is not None
+            and not self.retry_not_found
+            and self.negative_cache.get(file_id) is not None
+        )
+
+    def schedule_files(self, filenames):
+        """Group and order files for the worker queue"""
+        if self.schedule_strategy == ScheduleStrategy.FIFO:
+            return [[filename] for filename in filenames]
+        items = []
+        for filename in filenames:
+            try:
+                size = os.path.getsize(os.path.join(self.source_directory, filename))
+            except OSError:
+                size = 0
+            items.append((filename, size, self.is_local_work(filename)))
+        return schedule(items, self.schedule_strategy)
+
+    def build_download_budget(self):
+        """DownloadBudget for the API and image hosts from bandwidth_options"""
+        options = self.bandwidth_options
+        host_limits = {}
+        for url, limit in (
+            (self.api_url, options.get("api_connections")),
+            (self.image_base_url, options.get("cdn_connections")),
+        ):
+            host = DownloadBudget.host_of(url)
+            if limit:
+                # Both limits apply when the API and images share a host
+                host_limits[host] = min(limit, host_limits.get(host, limit))
+        return DownloadBudget(
+            bytes_per_sec=options.get("bytes_per_sec"),
+            host_limits=host_limits,
+            throttle_hours=options.get("throttle_hours"),
+        )
+
+    def process_batch(self, filenames):
+        """Organize files of the source directory with the worker threads"""
+        groups = self.schedule_files(filenames)
+
+        # Archives are verified ahead of the workers, in the order they are queued,
+        # except files skipped before verification (library hits, known misses)
+        if self.verify_archives:
+            self.start_archive_verifier(
+                state_path(self.models_root),
+                [
+                    os.path.join(self.source_directory, f)
+                    for group in groups
+                    for f in group
+                    if not self.is_local_work(f)
+                ],
+            )
+
+        # Initialize worker threads
+        self.processed_count = 0
+        self.threads = []
+        for i in range(self.max_workers):
+            thread = threading.Thread(
+                target=self.worker, args=(len(filenames),), name=f"Worker-{i+1}"
+            )
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+        # Add files to processing queue
+        for group in groups:
+            self.processing_queue.put(group)
+
+        # Add sentinel values to signal threads to exit
+        for _ in range(self.max_workers):
+            self.processing_queue.put(None)
+
+        # Wait for all threads to complete
+        try:
+            for thread in self.threads:
+                thread.join()
+        finally:
+            if self.archive_verifier is not None:
+                self.close_archive_verifier()
+            self.transfers.flush()
+
+    def save_library_state(self):
+        """Persist the library index and the not found cache"""
+        # Other shard processes save to the same files, keep their entries
+        merge = self.leases is not None
+        if self.library_index is not None:
+            self.library_index.save(merge=merge)
+        self.negative_cache.save(merge=merge)
+
+    def finish_organizing(self):
+        """Flush the failure log and caches at the end of a File Organizer run"""
+        self.failure_log.close()
+        if self.leases is not None:
+            self.leases.close()
+
+        # Summarize this run's failures as JSON in the destination directory
+        if self.failure_log.count:
+            not_found_log_path = os.path.join(self.models_root, self.not_found_log)
+            self.safe_print(
+                f"\n⚠️ {self.failure_log.count} failures logged to "
+                f"{self.failure_log.path}"
+            )
+            log_paths = self.failure_log.path
+            since = self.failure_log.started
+            if self.leases is not None:
+                # Merge the failures of every process of the shard, whenever it started
+                since = None
+                failure_log_dir = os.path.dirname(self.failure_log.path)
+                log_paths = [
+                    os.path.join(failure_log_dir, name)
+                    for name in os.listdir(failure_log_dir)
+                    if name.endswith(".ndjson")
+                ]
+            compact(log_paths, not_found_log_path, since=since)
+            self.logger.info(f"Wrote not found summary to {not_found_log_path}")
+
+        self.save_library_state()
+        if self.preview_cache is not None:
+            self.preview_cache.prune(self.preview_cache_max_bytes)
+        if self.preview_pipeline is not None:
+            self.safe_print("\n🖼️ Waiting for preview optimization to finish...")
+            with self.metrics.time("preview_optimize"):
+                stats = self.preview_pipeline.finish()
+            self.safe_print(f"🖼️ Previews: {describe_previews(stats)}")
+            self.preview_pipeline = None
+        self.leases = None
+
+    def watch(
+        self,
+        directories=None,
+        settle_seconds=5,
+        poll_interval=2,
+        batch_seconds=2,
+        use_inotify=True,
+    ):
+        """Organize archives dropped into the source folders until stopped"""
+        source_dir, dest_dir = self.get_directories()
+        directories = [os.path.abspath(source_dir)] + [
+            os.path.abspath(d) for d in (directories or [])
+        ]
+        directories = list(dict.fromkeys(directories))
+        for directory in directories + [dest_dir]:
+            if not os.path.exists(directory):
+                self.safe_print(f"❌ Error: Directory {directory} does not exist")
+                self.logger.error(f"Directory {directory} does not exist")
+                return
+
+        watcher = FolderWatcher(
+            directories,
+            settle_seconds=settle_seconds,
+            poll_interval=poll_interval,
+            use_inotify=use_inotify,
+        )
+        self.safe_print(
+            f"👀 Watching {len(directories)} folders ({watcher.mode}), Ctrl+C to stop"
+        )
+        self.logger.info(f"Watching {directories} ({watcher.mode})")
+
+        self.negative_cache = NegativeCache(self.models_root)
+        self.negative_cache.load()
+        self.stop_event.clear()
+        self.start_organizing()
+        try:
+            ready = watcher.initial()
+            while not self.stop_event.is_set():
+                if not ready:
+                    ready = watcher.wait(1)
+                    continue
+                # Let files dropped together arrive before starting a batch
+                deadline = time.monotonic() + batch_seconds
+                while time.monotonic() < deadline and not self.stop_event.is_set():
+                    ready += watcher.wait(deadline - time.monotonic())
+
+                # Previews may have been edited by hand since the last batch, and
+                # a long-running watch must not keep every folder it ever saw
+                self.preview_index.clear()
+                self.image_probe.clear()
+
+                batches = {}
+                for path in ready:
+                    batches.setdefault(os.path.dirname(path), []).append(
+                        os.path.basename(path)
+                    )
+                ready = []
+                for directory, filenames in batches.items():
+                    self.source_directory = directory
+                    self.total_files = len(filenames)
+                    self.safe_print(f"\n📥 {len(filenames)} new files in {directory}")
+                    self.progress.start(
+                        len(filenames), label=ProcessingMode.FILE_ORGANIZER
+                    )
+                    self.process_batch(filenames)
+                    self.progress.finish(f"Organized {len(filenames)} new files")
+                self.save_library_state()
+                self.update_folder_summary(self.models_root)
+        except KeyboardInterrupt:
+            self.safe_print("\n⛔ Stopping watch...")
+        finally:
+            watcher.close()
+            self.source_directory = source_dir
+            self.finish_organizing()
+        self.safe_print("\n✨ Watch stopped")
+
+    def worker(self, total_files):
+        """Worker thread to process files"""
+        while True:
+            group = self.processing_queue.get()
+            if group is None:  # Check for sentinel value
+                self.processing_queue.task_done()
+                break
+
+            # Files of one model are handled in order, later copies find the first
+            for filename in group:
+                used_api = self.organize_queued_file(filename, total_files)
+                # Only throttle after files that actually hit the API
+                if used_api:
+                    time.sleep(self.api_delay)
+            self.processing_queue.task_done()
+
+    def organize_queued_file(self, filename, total_files):
+        """Process a file taken from the queue, returns True if the API was queried"""
+        used_api = False
+        done = False
+        size = 0
+        source_path = os.path.join(self.source_directory, filename)
+        if self.leases is not None and not self.leases.claim(filename, source_path):
+            # Another process of the shard has or already organized it
+            self.progress.advance()
+            return False
+        try:
+            with self.counter_lock:
+                self.processed_count += 1
+                current_count = self.processed_count
+
+            self.progress.update_status(f"Processing: {filename}")
+            size = os.path.getsize(source_path)
+
+            self.safe_print(
+                f"\n📦 Processing file {current_count}/{total_files}: {filename}"
+            )
+            used_api = self.process_single_file(filename)
+            done = True
+        except Exception as e:
+            self.safe_print(f"❌ Error processing {filename}: {str(e)}")
+            self.logger.error(f"Error processing {filename}: {str(e)}")
+        finally:
+            if self.leases is not None:
+                # Without a done marker, other processes of the shard retry the file
+                self.leases.release(filename, done=done)
+            self.progress.advance(nbytes=size)
+        return used_api
+
+    def process_single_file(self, filename):
+        """Process a single file, returns True if the API was queried"""
+        source_path = os.path.join(self.source_directory, filename)
+        file_id = self.extract_file_id(filename)
+        members = None  # Member names of an archive whose ID came from inside
+        if not file_id and self.inspect_archives:
+            file_id, members = self.recover_file_id(source_path)
+        if not file_id:
+            self.safe_print(f"⚠️ Invalid filename format: {filename}")
+            self.logger.warning(f"Invalid filename format: {filename}")
+            self.record_failure(
+                filename, "invalid_name", "Invalid filename format", FailureStage.PARSE
+            )
+            return False
+
+        # Short-circuit files that are already organized in the library
+        if self.library_index is not None:
+            existing_path = self.library_index.lookup(file_id)
+            if existing_path:
+                self.handle_already_organized(filename, existing_path)
+                return False
+
+        # Skip IDs the API recently failed to resolve
+        if self.negative_cache is not None and not self.retry_not_found:
+            cached_miss = self.negative_cache.get(file_id)
+            if cached_miss:
+                hours = self.negative_cache.retry_after(cached_miss) / 3600
+                self.safe_print(
+                    f"⏭️ Known miss ({cached_miss['reason']}), "
+                    f"retrying in {hours:.1f}h: {file_id}"
+                )
+                return False
+
+        # Corrupt archives are quarantined before they cost an API request
+        if self.archive_verifier is not None and not self.check_archive(
+            source_path, self.source_directory
+        ):
+            return False
+
+        # Get model details from API
+        details = self.get_model_details(file_id)
+        if not details:
+            return True
+        if self.negative_cache is not None:
+            self.negative_cache.clear(file_id)
+
+        # Log successful find
+        self.logger.info(f"Found model: {details['title']} for file: {filename}")
+
+        # Create folder structure
+        destination_folder = self.create_folder_structure(details["categories"])
+
+        # Badly named archives were opened for their ID already, read a preview
+        # shipped inside before the archive leaves the source
+        embedded_preview = None
+        if self.download_previews and members:
+            embedded_preview = self.read_embedded_preview(source_path, file_id, members)
+
+        # First move all related files (zip and images) to destination
+        self.safe_print(f"📦 Moving files to: {os.path.basename(destination_folder)}")
+
+        # Move the compressed file first, named after its ID if that came from inside
+        dest_filename = filename
+        if members:
+            dest_filename = file_id + os.path.splitext(filename)[1].lower()
+        dest_path = os.path.join(destination_folder, dest_filename)
+
+        # "Organize again" replaces the library copy of the archive
+        replace = self.duplicate_policy == DuplicatePolicy.PROCESS
+        try:
+            try:
+                self.transfer_file(source_path, dest_path, replace=replace)
+            except FileNotFoundError:
+                if os.path.isdir(destination_folder):
+                    raise  # The source is gone
+                # The folder was deleted after it was cached, create it again
+                self.category_paths.discard(destination_folder)
+                self.create_folder_structure(details["categories"])
+                self.transfer_file(source_path, dest_path, replace=replace)
+            self.safe_print("✅ Compressed file moved successfully")
+            self.logger.info(f"Moved file to: {dest_path}")
+        except Exception as e:
+            self.safe_print(f"❌ Error moving compressed file: {str(e)}")
+            self.logger.error(f"Error moving file {filename}: {str(e)}")
+            self.record_failure(filename, "move_error", str(e), FailureStage.MOVE)
+            return True
+
+        if self.library_index is not None:
+            self.library_index.add(file_id, dest_path)
+
+        # Now attempt to download new image only if enabled
+        if embedded_preview:
+            data, width, height, extension = embedded_preview
+            self.safe_print("🖼️ Using the preview embedded in the archive")
+            self.keep_best_preview(
+                destination_folder,
+                file_id,
+                (data, width, height, len(data)),
+                self.existing_previews(destination_folder, file_id),
+                extension,
+            )
+        elif self.download_previews:
+            # Downloads are compared with the existing images before being written
+            download_success = self.download_preview(
+                details["image_url"], destination_folder, file_id
+            )
+            if not download_success:
+                self.safe_print(
+                    "⚠️ Using existing images (if any) due to download failure"
+                )
+                self.record_failure(
+                    file_id,
+                    "download_error",
+                    f"Preview download failed: {details['image_url']}",
+                    FailureStage.DOWNLOAD,
+                )
+        else:
+            # Just move existing images without downloading new ones
+            self.move_related_images(self.source_directory, destination_folder, file_id)
+
+        if self.preview_pipeline is not None:
+            for image_path in self.preview_index.candidates(
+                destination_folder, model_number_of(file_id)
+            ):
+                self.preview_pipeline.submit(image_path)
+
+        # Update folder summary after all files are in place
+        self.update_folder_summary(destination_folder)
+        return True
+
+    def recover_file_id(self, archive_path):
+        """Find the file ID of a badly named archive from its member names
+
+        Returns (file_id, member names), file_id is None if none was found.
+        """
+        try:
+            members = list_members(archive_path)
+        except Exception as e:
+            self.logger.warning(f"Could not read archive {archive_path}: {str(e)}")
+            return None, None
+        if not members:
+            return None, None
+        file_id = infer_file_id(members, self.extract_file_id)
+        if file_id:
+            filename = os.path.basename(archive_path)
+            self.safe_print(f"🔎 Found file ID {file_id} inside {filename}")
+            self.logger.info(f"Recovered file ID {file_id} from {filename}")
+        return file_id, members
+
+    def read_embedded_preview(self, archive_path, file_id, members):
+        """Return (data, width, height, extension) of a good preview in the archive"""
+        try:
+            name = find_preview(members, file_id)
+            if not name:
+                return None
+            data = read_member(archive_path, name, self.preview_memory_limit)
+            if not data:
+                return None
+            width, height = probe_bytes(data)
+        except Exception as e:
+            self.logger.warning(f"Could not read preview from {archive_path}: {str(e)}")
+            return None
+        if max(width, height) < self.embedded_preview_min_edge:
+            return None  # Too small, the CDN preview is likely better
+        extension = os.path.splitext(name)[1].lower()
+        return data, width, height, extension
+
+    def handle_already_organized(self, filename, existing_path):
+        """Skip or set aside a file whose ID is already in the library"""
+        relative_path = os.path.relpath(existing_path, self.models_root)
+        self.safe_print(f"📚 Already in library: {relative_path}")
+        self.logger.info(f"Already in library: {filename} ({existing_path})")
+
+        if self.duplicate_policy != DuplicatePolicy.MOVE_TO_DUPLICATES:
+            self.safe_print("⏭️ Skipped, left in source folder")
+            return
+
+        duplicate_folder = os.path.join(self.source_directory, "Duplicates")
+        if not os.path.exists(duplicate_folder):
+            os.makedirs(duplicate_folder, exist_ok=True)
+
+        source_path = os.path.join(self.source_directory, filename)
+        dest_path = os.path.join(duplicate_folder, filename)
+        base, ext = os.path.splitext(filename)
+        counter = 1
+        while os.path.exists(dest_path):
+            dest_path = os.path.join(duplicate_folder, f"{base}_{counter}{ext}")
+            counter += 1
+
+        try:
+            self.transfer_file(source_path, dest_path)
+            self.safe_print(f"🗑️ Moved to Duplicates: {os.path.basename(dest_path)}")
+        except Exception as e:
+            self.safe_print(f"❌ Error moving {filename} to Duplicates: {str(e)}")
+            self.logger.error(f"Error moving duplicate {filename}: {str(e)}")
+
+    def existing_previews(self, folder, file_id, exclude=None):
+        """Probe the images of a model already in a folder"""
+        existing_images = []
+        for img_path in self.preview_index.candidates(folder, model_number_of(file_id)):
+            if img_path == exclude:
+                continue
+            try:
+                image = self.image_probe.probe(img_path)
+            except FileNotFoundError:
+                self.preview_index.discard(img_path)  # Deleted by hand
+                continue
+            except Exception as e:
+                self.safe_print(
+                    f"⚠️ Error processing image {os.path.basename(img_path)}: {str(e)}"
+                )
+                continue
+            if self.preview_pipeline is not None:
+                image = self.preview_pipeline.as_original(image)
+            existing_images.append(image)
+        return existing_images
+
+    def remove_preview(self, path):
+        """Delete a preview image and forget it in the folder index and probe cache"""
+        os.remove(path)
+        self.preview_index.discard(path)
+        self.image_probe.discard(path)
+
+    def get_directories(self):
+        """Get source and destination directories if not provided"""
+        if not self.source_directory:
+            self.source_directory = input(
+                "Please enter the source directory path containing the files: "
+            ).strip()
+            print(f"Source directory set to: {self.source_directory}")
+
+        if not self.destination_directory:
+            self.destination_directory = input(
+                "Please enter the destination directory path: "
+            ).strip()
+            print(f"Destination directory set to: {self.destination_directory}")
+
+        # Create 3ds_models folder in destination
+        self.models_root = os.path.join(self.destination_directory, "3ds_models")
+        if not os.path.exists(self.models_root):
+            os.makedirs(self.models_root)
+            print(f"Created 3ds_models directory at: {self.models_root}")
+            self.logger.info(f"Created 3ds_models directory at: {self.models_root}")
+        prepare_state_dir(self.models_root)
+
+        return self.source_directory, self.destination_directory
+
+    def extract_file_id(self, filename):
+        """Extract the file ID from filename"""
+        base_name = os.path.splitext(filename)[0]
+        if re.match(r"^\d+\.[a-f0-9]+$", base_name):
+            return base_name
+        return None
+
+    @timed("api_lookup")
+    def get_model_details(self, file_id):
+        """Get model details from 3dsky.org API"""
+        import requests  # Imported on first use, only API modes need it
+
+        print(f"\nFetching details for model ID: {file_id}")
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Content-Type": "application/json",
+        }
+        payload = {"query": file_id, "order": "relevance"}
+
+        try:
+            if self.api_limiter:
+                self.api_limiter.acquire()
+            print("Making API request...")
+            self.progress.api_request()
+            with self.download_budget.slot(self.api_url):
+                response = requests.post(self.api_url, json=payload, headers=headers)
+            response.raise_for_status()
+            data = response.json()
+
+            if not data.get("data", {}).get("models"):
+                print(f"❌ No models found for ID: {file_id}")
+                self.logger.error(
+                    f"No models found in API response for file_id: {file_id}"
+                )
+                self.record_not_found(
+                    file_id, MissReason.NOT_FOUND, "No models found in API response"
+                )
+                return None
+
+            model = data["data"]["models"][0]
+            print(f"✅ Found model: {model.get('title_en', 'Untitled')}")
+
+            # Get category information
+            categories = []
+            if model.get("category_parent"):
+                categories.append(model["category_parent"]["title_en"])
+            if model.get("category"):
+                categories.append(model["category"]["title_en"])
+
+            if not categories:
+                print(f"❌ No categories found for model: {file_id}")
+                self.logger.error(f"No categories found for model: {file_id}")
+                self.record_not_found(
+                    file_id, MissReason.NO_CATEGORIES, "No categories found"
+                )
+                return None
+
+            # Find matching image
+            image_path = None
+            for image in model.get("images", []):
+                if image.get("file_name", "").startswith(file_id.split(".")[0]):
+                    image_path = image.get("web_path")
+                    break
+
+            if not image_path:
+                print(f"⚠️ No matching image found for model: {file_id}")
+                self.logger.error(f"No matching image found for model: {file_id}")
+                self.record_not_found(
+                    file_id, MissReason.NO_IMAGE, "No matching image found"
+                )
+                return None
+
+            image_url = f"{self.image_base_url}{image_path}"
+
+            return {
+                "categories": categories,
+                "image_url": image_url,
+                "title": model.get("title_en"),
+            }
+
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Error getting details for {file_id}: {str(e)}")
+            self.logger.error(f"Error getting details for {file_id}: {str(e)}")
+            self.record_not_found(file_id, MissReason.NETWORK, str(e))
+            return None
+        except Exception as e:
+            print(f"❌ Error getting details for {file_id}: {str(e)}")
+            self.logger.error(f"Error getting details for {file_id}: {str(e)}")
+            self.record_not_found(file_id, MissReason.ERROR, str(e))
+            return None
+
+    def record_failure(self, key, reason, message, stage):
+        """Append a failure event to the streaming failure log"""
+        if self.failure_log is not None:
+            self.failure_log.record(key, reason, message, stage)
+
+    def record_not_found(self, file_id, reason, message):
+        """Record an unresolvable file ID in the failure log and miss cache"""
+        self.record_failure(file_id, reason, message, FailureStage.LOOKUP)
+        self.metrics.error("api_lookup", reason)
+        if self.negative_cache is not None:
+            self.negative_cache.record(file_id, reason, message)
+
+    def create_folder_structure(self, categories):
+        """Create folder structure based on categories"""
+        current_path, created = self.category_paths.resolve(
+            self.models_root, categories
+        )
+        for clean_category in created:
+            print(f"📁 Created category folder: {clean_category}")
+        return current_path
+
+    @timed("preview_download")
+    def download_preview(self, image_url, folder, file_id):
+        """Download a preview and keep it only if it beats the existing images
+
+        Previews come from the shared preview cache when it is enabled, otherwise
+        they are buffered in memory, so a preview that loses the comparison never
+        touches the library. Returns False if the download failed.
+        """
+        import requests
+
+        part_path = os.path.join(folder, f".{file_id}.jpeg.part")
+        existing_images = self.existing_previews(folder, file_id)
+        best_existing = max(existing_images, key=image_rank, default=None)
+
+        print("📥 Downloading preview image...")
+        try:
+            if self.preview_cache is not None:
+                body_path, status, transferred = self.preview_cache.fetch(image_url)
+                self.metrics.add_bytes("preview_download", transferred)
+                if status != CacheStatus.DOWNLOADED:
+                    print(f"💾 Preview served from cache ({status})")
+                cached = self.image_probe.probe(body_path)
+                fetched = (body_path, cached["width"], cached["height"], cached["size"])
+            else:
+                fetched = self.fetch_preview(image_url, part_path, best_existing)
+                if fetched is None:
+                    return True
+            print("✅ Image downloaded successfully")
+            self.keep_best_preview(folder, file_id, fetched, existing_images)
+            return True
+        except requests.exceptions.Timeout:
+            print("⚠️ Download timed out")
+            self.logger.error(f"Timeout downloading image {image_url}")
+            self.metrics.error("preview_download", "timeout")
+            return False
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Error downloading image: {str(e)}")
+            self.logger.error(f"Error downloading image {image_url}: {str(e)}")
+            self.metrics.error("preview_download", "network")
+            return False
+        except Exception as e:
+            self.metrics.error("preview_download", "error")
+            print(f"❌ Unexpected error while downloading image: {str(e)}")
+            self.logger.error(
+                f"Unexpected error downloading image {image_url}: {str(e)}"
+            )
+            return False
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)  # Interrupted, failed or losing download
+
+    def keep_best_preview(
+        self, folder, file_id, fetched, existing_images, extension=".jpeg"
+    ):
+        """Write a preview only if it beats the existing images of the model
+
+        fetched is (data, width, height, size) with data as bytes or a file path.
+        Returns True if the preview was written.
+        """
+        data, width, height, size = fetched
+        destination = os.path.join(folder, f"{file_id}{extension}")
+        part_path = os.path.join(folder, f".{file_id}{extension}.part")
+        with self.metrics.time("image_compare"):
+            best_existing = max(existing_images, key=image_rank, default=None)
+            new_rank = image_rank({"resolution": width * height, "size": size})
+            if best_existing and image_rank(best_existing) >= new_rank:
+                print("📸 Kept existing higher quality image")
+                return False
+
+        # Write next to the destination and rename, never leaving a partial preview
+        try:
+            if isinstance(data, bytes):
+                with open(part_path, "wb") as f:
+                    f.write(data)
+            elif data != part_path:
+                shutil.copyfile(data, part_path)
+            os.replace(part_path, destination)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        self.image_probe.store(destination, width, height)
+        self.preview_index.add(destination)
+        for img in existing_images:
+            if img["path"] != destination:
+                self.remove_preview(img["path"])
+        if existing_images:
+            print("📸 Replaced with higher quality image")
+        else:
+            print("📸 Kept new image (no existing images)")
+        return True
+
+    def fetch_preview(self, image_url, part_path, best_existing):
+        """Stream a preview into memory, spilling to part_path when it is too large
+
+        Returns (data, width, height, size) with data as bytes or part_path, or
+        None when the preview can't beat best_existing and was not read fully.
+        """
+        import requests
+
+        with self.download_budget.slot(image_url), requests.get(
+            image_url, stream=True, timeout=30
+        ) as response:
+            response.raise_for_status()
+            length = int(response.headers.get("Content-Length") or 0)
+            if best_existing and length == best_existing["size"]:
+                print("📸 Existing image has the same size, download skipped")
+                return None
+
+            buffer = bytearray()
+            dimensions = None
+            downloaded = 0
+            spill = None
+            try:
+                for chunk in response.iter_content(chunk_size=65536):
+                    if not chunk:
+                        continue
+                    downloaded += len(chunk)
+                    self.download_budget.consume(len(chunk))
+                    if spill:
+                        spill.write(chunk)
+                        continue
+                    buffer += chunk
+                    if len(buffer) > self.preview_memory_limit:
+                        # Too large to hold, continue on disk
+                        spill = open(part_path, "wb")
+                        spill.write(buffer)
+                        buffer = bytearray()
+                        continue
+                    if best_existing and length and dimensions is None:
+                        # Stop early once the header shows the preview can't win
+                        dimensions = read_dimensions(io.BytesIO(buffer))
+                        if dimensions and image_rank(
+                            {
+                                "resolution": dimensions[0] * dimensions[1],
+                                "size": length,
+                            }
+                        ) <= image_rank(best_existing):
+                            print("📸 Kept existing higher quality image")
+                            return None
+            finally:
+                self.metrics.add_bytes("preview_download", downloaded)
+                if spill:
+                    spill.close()
+
+        if spill:
+            return (part_path, *probe_dimensions(part_path), downloaded)
+        data = bytes(buffer)
+        return (data, *(dimensions or probe_bytes(data)), downloaded)
+
+    @timed("folder_summary")
+    def update_folder_summary(self, folder_path):
+        """Update folder summary JSON file with accurate subfolder counting"""
+        print(f"\nUpdating folder summary for: {folder_path}")
+        summary = {
+            "total_files": 0,
+            "total_subfolders": 0,
+            "file_types": {},
+            "last_updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+        # Get immediate subfolders
+        immediate_subfolders = [
+            d
+            for d in os.listdir(folder_path)
+            if d != STATE_DIR_NAME and os.path.isdir(os.path.join(folder_path, d))
+        ]
+        summary["total_subfolders"] = len(immediate_subfolders)
+
+        # Count files only in current directory
+        for item in os.listdir(folder_path):
+            item_path = os.path.join(folder_path, item)
+            if os.path.isfile(item_path) and item != "folder_summary.json":
+                summary["total_files"] += 1
+                ext = os.path.splitext(item)[1].lower()
+                summary["file_types"][ext] = summary["file_types"].get(ext, 0) + 1
+
+        # Write summary to JSON file
+        summary_path = os.path.join(folder_path, "folder_summary.json")
+        # Atomic, other processes may update the same folder
+        temp_path = f"{summary_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+        os.replace(temp_path, summary_path)
+
+        print(
+            f"📊 Summary updated for {os.path.basename(folder_path)}: "
+            f"{summary['total_files']} files, "
+            f"{summary['total_subfolders']} immediate subfolders"
+        )
+        return summary
+
+    def move_related_images(self, source_dir, dest_dir, model_id):
+        """Move any related image files to destination directory"""
+        print("🔍 Looking for related images...")
+        image_extensions = IMAGE_EXTENSIONS
+        model_number = model_id.split(".")[0]
+        moved_count = 0
+
+        # Get list of files to move before starting moves
+        files_to_move = []
+        for filename in os.listdir(source_dir):
+            file_base, ext = os.path.splitext(filename)
+            if ext.lower() in image_extensions and file_base.startswith(model_number):
+                files_to_move.append(filename)
+
+        # Move files with proper error handling
+        for filename in files_to_move:
+            source_path = os.path.join(source_dir, filename)
+            dest_path = os.path.join(dest_dir, filename)
+            try:
+                self.transfer_file(source_path, dest_path)
+                self.preview_index.add(dest_path)
+                moved_count += 1
+                self.logger.info(f"Moved related image: {filename} to {dest_dir}")
+            except Exception as e:
+                print(f"❌ Error moving image {filename}: {str(e)}")
+                self.logger.error(f"Error moving related image {filename}: {str(e)}")
+
+        if moved_count > 0:
+            print(f"✅ Moved {moved_count} related images")
+        else:
+            print("ℹ️ No related images found")
+
+    def fix_duplicates(self):
+        """Fix duplicate files in the source directory"""
+        if not self.source_directory:
+            self.safe_print("❌ Source directory not specified")
+            return
+
+        self.safe_print("\n🔍 Scanning for duplicate files...")
+
+        # Dictionary to store file groups (with extensions) and their variants
+        file_groups = {}
+
+        # First pass: Group files
+        for root, _, files in walk_library(self.source_directory):
+            for filename in files:
+                # Remove numbers in parentheses for comparison but keep the extension
+                base_name = re.sub(r"\s*\(\d+\)\s*", "", filename).strip()
+                print(f"Base Name {base_name}, File Name {filename}")
+                file_path = os.path.join(root, filename)
+                if base_name not in file_groups:
+                    file_groups[base_name] = []
+                file_groups[base_name].append(file_path)
+
+        # Filter only groups with duplicates
+        duplicate_groups = {k: v for k, v in file_groups.items() if len(v) > 1}
+
+        if not duplicate_groups:
+            self.safe_print("✨ No duplicate files found!")
+            return
+
+        total_groups = len(duplicate_groups)
+        self.safe_print(f"\n📊 Found {total_groups} files with duplicates")
+        self.progress.start(total_groups, label=ProcessingMode.DUPLICATE_FIXER)
+
+        for base_name, file_paths in duplicate_groups.items():
+            duplicate_folder = os.path.join(self.source_directory, "Duplicates")
+            if not os.path.exists(duplicate_folder):
+                os.makedirs(duplicate_folder)
+
+            self.progress.update_status(f"Processing: {base_name}")
+
+            self.safe_print(f"\n📦 Processing duplicates for: {base_name}")
+
+            # Get file sizes
+            file_sizes = [(path, os.path.getsize(path)) for path in file_paths]
+
+            # Sort by size (largest first)
+            file_sizes.sort(key=lambda x: x[1], reverse=True)
+
+            # If all files have the same size, keep the one without numbers
+            if all(size == file_sizes[0][1] for _, size in file_sizes):
+                # Try to find a file without numbers in parentheses
+                clean_name_file = next(
+                    (
+                        path
+                        for path in file_paths
+                        if not re.search(r"\(\d+\)", os.path.basename(path))
+                    ),
+                    file_sizes[0][0],  # If none found, use the first file
+                )
+                files_to_keep = [clean_name_file]
+            else:
+                # Keep the largest file
+                files_to_keep = [file_sizes[0][0]]
+
+            # Move all other files to a subfolder
+            for file_path, size in file_sizes:
+                if file_path not in files_to_keep:
+                    # Copies from other folders may share a name, keep them all
+                    dest_path = os.path.join(
+                        duplicate_folder, os.path.basename(file_path)
+                    )
+                    base, ext = os.path.splitext(dest_path)
+                    counter = 1
+                    while os.path.exists(dest_path):
+                        dest_path = f"{base}_{counter}{ext}"
+                        counter += 1
+                    try:
+                        self.transfer_file(file_path, dest_path)
+                        self.safe_print(f"🗑️ Moved: {os.path.basename(file_path)}")
+                    except Exception as e:
+                        self.safe_print(
+                            f"❌ Error Moving {os.path.basename(file_path)}: {str(e)}"
+                        )
+
+            # Rename the kept file if it has numbers in parentheses
+            kept_file = files_to_keep[0]
+            kept_filename = os.path.basename(kept_file)
+            if re.search(r"\(\d+\)", kept_filename):
+                # new_filename = re.sub(
+                #     r"\s*\(\d+\)\s*$", "", kept_filename
+                # )  # Remove numbers in parentheses
+                new_path = os.path.join(
+                    os.path.dirname(kept_file), base_name
+                )  # base name should be without number we are processing this above
+                try:
+                    os.rename(kept_file, new_path)
+                    self.safe_print(f"✅ Renamed to: {base_name}")
+                except Exception as e:
+                    self.safe_print(f"❌ Error renaming {kept_filename}: {str(e)}")
+            self.progress.advance()
+
+        self.progress.finish("Duplicate fixing complete!")
+        self.safe_print("\n✨ Duplicate fixing complete! Now Run Remove Number")
+
+    def single_folder_operation(self, operation="move"):
+        """Move or copy all files from source directory to a single destination folder"""
+        source_dir, dest_dir = self.get_directories()
+
+        if not os.path.exists(dest_dir):
+            os.makedirs(dest_dir)
+
+        self.safe_print("\n🔍 Starting single folder operation...")
+
+        total_files = sum(len(files) for _, _, files in walk_library(source_dir))
+        self.progress.start(total_files, label=ProcessingMode.SINGLE_FOLDER)
+
+        # Walk through all files in the source directory
+        for root, _, files in walk_library(source_dir):
+            for file in files:
+                self.progress.update_status(f"{operation.capitalize()}ing: {file}")
+                source_file = os.path.join(root, file)
+                dest_file = os.path.join(dest_dir, file)
+
+                # Handle duplicate filenames
+                if os.path.exists(dest_file):
+                    base, ext = os.path.splitext(file)
+                    counter = 1
+                    while os.path.exists(dest_file):
+                        dest_file = os.path.join(dest_dir, f"{base}_{counter}{ext}")
+                        counter += 1
+
+                size = 0
+                try:
+                    size = self.transfer_file(source_file, dest_file, operation)
+                    if operation == "move":
+                        self.safe_print(f"✅ Moved: {file}")
+                    else:  # copy
+                        self.safe_print(f"✅ Copied: {file}")
+                except Exception as e:
+                    self.safe_print(f"❌ Error {operation}ing {file}: {str(e)}")
+                self.progress.advance(nbytes=size)
+
+        self.progress.finish("Single folder operation complete!")
+        self.safe_print("\n✨ Single folder operation complete!")
+
+    def remove_numbers(self):
+        """Remove any (number) part from file names in the source directory"""
+        if not self.source_directory:
+            self.safe_print("❌ Source directory not specified")
+            return
+
+        self.safe_print("\n🔍 Starting number removal process...")
+
+        total_files = sum(
+            len(files) for _, _, files in walk_library(self.source_directory)
+        )
+        self.progress.start(total_files, label=ProcessingMode.REMOVE_NUMBER)
+
+        for root, _, files in walk_library(self.source_directory):
+            for filename in files:
+                self.progress.advance(status=f"Processing: {filename}")
+
+                new_filename = re.sub(
+                    r"\s*\(\d+\)\s*", "", filename
+                )  # Remove (number) parts
+                if new_filename != filename:  # Only rename if there's a change
+                    old_file_path = os.path.join(root, filename)
+                    new_file_path = os.path.join(root, new_filename)
+                    if os.path.exists(
+                        new_file_path
+                    ):  # Check if the new filename already exists
+                        self.safe_print(f"⚠️ File already exists: {new_filename}")
+                    else:
+                        try:
+                            os.rename(old_file_path, new_file_path)
+                            self.safe_print(f"✅ Renamed: {filename} to {new_filename}")
+                        except Exception as e:
+                            self.safe_print(f"❌ Error renaming {filename}: {str(e)}")
+
+        self.progress.finish("Number removal complete!")
+        self.safe_print("\n✨ Number removal complete!")
+
+    def dedupe_previews(self):
+        """Find near-duplicate previews across the library by perceptual hash"""
+        root = self.source_directory
+        if not root or not os.path.exists(root):
+            self.safe_print("❌ Source directory not specified or does not exist")
+            return
+
+        self.safe_print("\n🔍 Scanning previews...")
+        prepare_state_dir(root)
+        deduplicator = PreviewDeduplicator(root)
+        images = deduplicator.list_images()
+        self.progress.start(len(images), label=ProcessingMode.PREVIEW_DEDUP)
+        self.safe_print(
+            f"🖼️ Hashing {len(images)} previews on "
+            f"{deduplicator.processes} processes..."
+        )
+
+        def on_hashed(relative_path, ok):
+            if not ok:
+                self.safe_print(f"⚠️ Could not read image: {relative_path}")
+                self.metrics.error("preview_hash", "unreadable")
+            self.progress.advance(status=f"Hashed: {os.path.basename(relative_path)}")
+
+        with self.metrics.time("preview_hash"):
+            hashes = deduplicator.hash_images(images, on_hashed)
+        groups = deduplicator.find_groups(hashes)
+        self.safe_print(f"\n📊 Found {len(groups)} groups of similar previews")
+
+        # Extra copies of the same model are set aside, different models only reported
+        duplicate_folder = os.path.join(root, "Duplicates", "Previews")
+        report = []
+        moved_count = 0
+        for group in groups:
+            entry = {"images": group, "moved": []}
+            for model_number, paths in split_by_model(group).items():
+                if model_number is None or len(paths) < 2:
+                    continue
+                try:
+                    probed = [
+                        self.image_probe.probe(os.path.join(root, p)) for p in paths
+                    ]
+                except Exception as e:
+                    self.safe_print(
+                        f"⚠️ Error comparing previews of {model_number}: {str(e)}"
+                    )
+                    continue
+                best = max(probed, key=image_rank)
+                for image in probed:
+                    if image is best:
+                        continue
+                    relative_path = os.path.relpath(image["path"], root)
+                    dest_path = os.path.join(duplicate_folder, relative_path)
+                    base, ext = os.path.splitext(dest_path)
+                    counter = 1
+                    while os.path.exists(dest_path):
+                        dest_path = f"{base}_{counter}{ext}"
+                        counter += 1
+                    try:
+                        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                        self.transfer_file(image["path"], dest_path)
+                        entry["moved"].append(relative_path)
+                        moved_count += 1
+                        self.safe_print(f"🗑️ Moved duplicate preview: {relative_path}")
+                    except Exception as e:
+                        self.safe_print(f"❌ Error moving {relative_path}: {str(e)}")
+                        self.logger.error(
+                            f"Error moving preview {relative_path}: {str(e)}"
+                        )
+            report.append(entry)
+
+        report_path = os.path.join(root, "preview_duplicates.json")
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"threshold": deduplicator.threshold, "groups": report}, f, indent=4
+            )
+        self.logger.info(f"Wrote preview duplicate report to {report_path}")
+
+        self.progress.finish("Preview dedup complete!")
+        self.safe_print(
+            f"\n✨ Preview dedup complete! {moved_count} previews moved to "
+            f"{duplicate_folder}, groups listed in {report_path}"
+        )
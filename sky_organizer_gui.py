@@ -1,58 +1,73 @@
 import argparse
 import io
-import json
-import logging
 import os
-import queue
-import re
-import shutil
 import sys
 import threading
-import time
 import tkinter as tk
-from datetime import datetime
-from pathlib import Path
+from collections import deque
 from threading import Lock
 from tkinter import filedialog, scrolledtext, ttk
-from typing import Any, Dict
 
-import requests
-from PIL import Image
+from profiling import add_profiling_arguments, profile_options_from_args
+from progress import ProgressBus, describe
+from scheduler import STRATEGY_DESCRIPTIONS, ScheduleStrategy
+from sky_organizer import (
+    DuplicatePolicy,
+    OrganizerOptions,
+    ProcessingMode,
+    SkyFileOrganizer,
+)
 
 
 class IORedirector(io.StringIO):
-    def __init__(self, text_widget):
+    """Queue-backed stdout sink drained into a text widget by the Tk main loop"""
+
+    def __init__(self, text_widget, max_lines=5000, max_pending=20000, interval_ms=50):
         super().__init__()
         self.text_widget = text_widget
+        self.max_lines = max_lines  # Lines kept in the widget
+        self.max_pending = max_pending  # Writes buffered between frames
+        self.interval_ms = interval_ms
+        self.pending = deque()
+        self.dropped = 0
+        self.lock = Lock()
+        self.text_widget.after(self.interval_ms, self.drain)
 
     def write(self, string):
-        self.text_widget.insert(tk.END, string)
-        self.text_widget.see(tk.END)
-        self.text_widget.update()
+        # Called from worker threads, never touches the widget
+        with self.lock:
+            if len(self.pending) >= self.max_pending:
+                self.pending.popleft()
+                self.dropped += 1
+            self.pending.append(string)
+        return len(string)
 
     def flush(self):
         pass
 
+    def drain(self):
+        """Insert everything written since the last frame in a single batch"""
+        with self.lock:
+            chunks = list(self.pending)
+            self.pending.clear()
+            dropped = self.dropped
+            self.dropped = 0
+
+        # Older output would be trimmed right away, don't bother inserting it
+        if len(chunks) > self.max_lines:
+            dropped += len(chunks) - self.max_lines
+            chunks = chunks[-self.max_lines :]
+        if dropped:
+            chunks.insert(0, f"\n… {dropped} messages skipped to keep up …\n")
 
-class ProcessingMode:
-    FILE_ORGANIZER = "File Organizer"
-    FOLDER_MERGER = "Folder Merger"
-    FILE_COLLECTOR = "File Collector"
-    DUPLICATE_FIXER = "Duplicate Fixer"
-    REMOVE_NUMBER = "Remove (Number)"
-    SINGLE_FOLDER = "Single Folder"
+        if chunks:
+            self.text_widget.insert(tk.END, "".join(chunks))
+            line_count = int(self.text_widget.index("end-1c").split(".")[0])
+            if line_count > self.max_lines:
+                self.text_widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+            self.text_widget.see(tk.END)
 
-    @staticmethod
-    def get_tooltip(mode: str) -> str:
-        tooltips = {
-            ProcessingMode.FILE_ORGANIZER: "Organizes individual 3DSky files into categorized folders",
-            ProcessingMode.FOLDER_MERGER: "Merges two pre-organized 3DSky folders while updating folder summaries",
-            ProcessingMode.FILE_COLLECTOR: "Collects all zip and image files from source directory and its subdirectories",
-            ProcessingMode.DUPLICATE_FIXER: "Finds and fixes duplicate files by keeping the largest version and cleaning up names",
-            ProcessingMode.REMOVE_NUMBER: "Remove number from file name, Run this after Duplicate Fixer",
-            ProcessingMode.SINGLE_FOLDER: "Copy/Move a structured folder's files into a single destination folder",
-        }
-        return tooltips.get(mode, "")
+        self.text_widget.after(self.interval_ms, self.drain)
 
 
 class CreateToolTip:
@@ -119,8 +134,22 @@ class SkyFileOrganizerGUI:
         self.is_running = False
         self.operation_var = tk.StringVar(value="move")
         self.download_preview_var = tk.BooleanVar(value=True)  # Default to True
+        self.optimize_previews_var = tk.BooleanVar(value=False)
+        self.verify_archives_var = tk.BooleanVar(value=False)
+        self.inspect_archives_var = tk.BooleanVar(value=True)
+        self.duplicate_policy_var = tk.StringVar(
+            value=DuplicatePolicy.MOVE_TO_DUPLICATES
+        )
+        self.rescan_library_var = tk.BooleanVar(value=False)
+        self.retry_not_found_var = tk.BooleanVar(value=False)
+        self.schedule_var = tk.StringVar(value=ScheduleStrategy.FAST_FEEDBACK)
+        self.progress_bus = ProgressBus()
+        self.progress_rate = 4  # GUI progress refreshes per second
+        self.progress_version = -1
+        self.profile_options = None  # Set by --profile flags or Ctrl+Shift+P
 
         self.setup_gui()
+        self.root.bind("<Control-P>", self.toggle_profiling)
 
     def setup_gui(self):
         # Create main frame
@@ -141,6 +170,7 @@ class SkyFileOrganizerGUI:
                 ProcessingMode.DUPLICATE_FIXER,
                 ProcessingMode.REMOVE_NUMBER,
                 ProcessingMode.SINGLE_FOLDER,
+                ProcessingMode.PREVIEW_DEDUP,
             ]
         ):
             rb = ttk.Radiobutton(
@@ -170,6 +200,13 @@ class SkyFileOrganizerGUI:
             value="copy",
             variable=self.operation_var,
         ).grid(row=0, column=1, padx=10)
+        # Only shown for Folder Merger, File Organizer has it in Library Options
+        self.merge_verify_check = ttk.Checkbutton(
+            self.operation_frame,
+            text="Verify archives, quarantine corrupt ones",
+            variable=self.verify_archives_var,
+        )
+        self.merge_verify_check.grid(row=0, column=2, padx=10)
 
         # Add preview download option after operation frame
         self.preview_frame = ttk.LabelFrame(
@@ -184,13 +221,84 @@ class SkyFileOrganizerGUI:
             text="Download preview images from 3DSky",
             variable=self.download_preview_var,
         ).grid(row=0, column=0, padx=10)
+        ttk.Checkbutton(
+            self.preview_frame,
+            text="Optimize previews and create thumbnails",
+            variable=self.optimize_previews_var,
+        ).grid(row=0, column=1, padx=10)
+
+        # Files already present in the library or known to be unresolvable
+        self.library_frame = ttk.LabelFrame(
+            main_frame, text="Library Options", padding="5"
+        )
+        self.library_frame.grid(
+            row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5
+        )
+
+        for i, policy in enumerate(
+            [
+                DuplicatePolicy.MOVE_TO_DUPLICATES,
+                DuplicatePolicy.SKIP,
+                DuplicatePolicy.PROCESS,
+            ]
+        ):
+            ttk.Radiobutton(
+                self.library_frame,
+                text=DuplicatePolicy.get_label(policy),
+                value=policy,
+                variable=self.duplicate_policy_var,
+            ).grid(row=0, column=i, padx=10)
+        ttk.Checkbutton(
+            self.library_frame,
+            text="Rescan library instead of using saved catalog",
+            variable=self.rescan_library_var,
+        ).grid(row=1, column=0, columnspan=3, padx=10, sticky=tk.W)
+        ttk.Checkbutton(
+            self.library_frame,
+            text="Retry previously not found files only",
+            variable=self.retry_not_found_var,
+        ).grid(row=2, column=0, columnspan=3, padx=10, sticky=tk.W)
+        ttk.Checkbutton(
+            self.library_frame,
+            text="Verify archives, quarantine corrupt ones",
+            variable=self.verify_archives_var,
+        ).grid(row=3, column=0, columnspan=3, padx=10, sticky=tk.W)
+        inspect_check = ttk.Checkbutton(
+            self.library_frame,
+            text="Read file IDs and previews inside badly named archives",
+            variable=self.inspect_archives_var,
+        )
+        inspect_check.grid(row=4, column=0, columnspan=3, padx=10, sticky=tk.W)
+        CreateToolTip(
+            inspect_check,
+            "Lists the members of archives without a file ID in their name, "
+            "without extracting them. Turn off for slow network sources.",
+        )
+        ttk.Label(self.library_frame, text="Processing order:").grid(
+            row=5, column=0, padx=10, sticky=tk.W
+        )
+        schedule_box = ttk.Combobox(
+            self.library_frame,
+            textvariable=self.schedule_var,
+            values=ScheduleStrategy.ALL,
+            state="readonly",
+            width=16,
+        )
+        schedule_box.grid(row=5, column=1, padx=10, sticky=tk.W)
+        CreateToolTip(
+            schedule_box,
+            "\n".join(
+                f"{strategy}: {STRATEGY_DESCRIPTIONS[strategy]}"
+                for strategy in ScheduleStrategy.ALL
+            ),
+        )
 
         # Source directory selection
         self.source_frame = ttk.LabelFrame(
             main_frame, text="Source Directory", padding="5"
         )
         self.source_frame.grid(
-            row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5
+            row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5
         )
 
         # ttk.Label(self.source_frame, text="Source Directory:").grid(
@@ -207,7 +315,7 @@ class SkyFileOrganizerGUI:
         self.dest_frame = ttk.LabelFrame(
             main_frame, text="Destination Directory", padding="5"
         )
-        self.dest_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
+        self.dest_frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
 
         # ttk.Label(self.dest_frame, text="Destination Directory:").grid(
         #     row=0, column=0, sticky=tk.W, pady=5
@@ -221,7 +329,7 @@ class SkyFileOrganizerGUI:
 
         # Progress information
         progress_frame = ttk.LabelFrame(main_frame, text="Progress", padding="5")
-        progress_frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
+        progress_frame.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
 
         # Add progress bar
         self.progress_bar = ttk.Progressbar(
@@ -242,23 +350,25 @@ class SkyFileOrganizerGUI:
         # Add file count label
         self.file_count_label = ttk.Label(progress_frame, text="")
         self.file_count_label.grid(row=2, column=0, columnspan=2, pady=2)
+        self.root.after(1000 // self.progress_rate, self.poll_progress)
 
         # Console output
         console_frame = ttk.LabelFrame(main_frame, text="Console Output", padding="5")
         console_frame.grid(
-            row=6, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5
+            row=7, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5
         )
-        main_frame.rowconfigure(6, weight=1)
+        main_frame.rowconfigure(7, weight=1)
         main_frame.columnconfigure(1, weight=1)
 
         self.console = scrolledtext.ScrolledText(
             console_frame, wrap=tk.WORD, width=70, height=20
         )
         self.console.pack(fill=tk.BOTH, expand=True)
+        self.console_sink = IORedirector(self.console)
 
         # Buttons
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=7, column=0, columnspan=3, pady=10)
+        button_frame.grid(row=8, column=0, columnspan=3, pady=10)
 
         self.start_button = ttk.Button(
             button_frame, text="Start Processing", command=self.start_processing
@@ -300,6 +410,7 @@ class SkyFileOrganizerGUI:
         if not dest_dir and self.mode_var.get() not in {
             ProcessingMode.REMOVE_NUMBER,
             ProcessingMode.DUPLICATE_FIXER,
+            ProcessingMode.PREVIEW_DEDUP,
         }:
             self.console.insert(tk.END, "❌ Please select destination directory.\n")
             return
@@ -310,6 +421,7 @@ class SkyFileOrganizerGUI:
             not in {
                 ProcessingMode.REMOVE_NUMBER,
                 ProcessingMode.DUPLICATE_FIXER,
+                ProcessingMode.PREVIEW_DEDUP,
             }
         ):
             self.console.insert(
@@ -320,10 +432,9 @@ class SkyFileOrganizerGUI:
         # Disable the start button and update status
         self.start_button.configure(state="disabled")
         self.is_running = True
-        self.progress_var.set("Processing...")
 
         # Redirect stdout to our console
-        sys.stdout = IORedirector(self.console)
+        sys.stdout = self.console_sink
 
         # Start processing in a separate thread
         thread = threading.Thread(
@@ -334,899 +445,110 @@ class SkyFileOrganizerGUI:
 
     def run_processor(self, source_dir, dest_dir, mode):
         try:
+            options = OrganizerOptions(
+                download_previews=self.download_preview_var.get(),
+                duplicate_policy=self.duplicate_policy_var.get(),
+                rescan_library=self.rescan_library_var.get(),
+                retry_not_found=self.retry_not_found_var.get(),
+                profile_options=self.profile_options,
+                preview_options={} if self.optimize_previews_var.get() else None,
+                verify_archives=self.verify_archives_var.get(),
+                inspect_archives=self.inspect_archives_var.get(),
+                schedule_strategy=self.schedule_var.get(),
+            )
             organizer = SkyFileOrganizer(
-                source_dir, dest_dir, download_previews=self.download_preview_var.get()
+                source_dir, dest_dir, options, progress=self.progress_bus
             )
-            organizer.gui = self  # Store reference to GUI
-
-            if mode == ProcessingMode.DUPLICATE_FIXER:
-                organizer.fix_duplicates()
-            elif mode == ProcessingMode.REMOVE_NUMBER:
-                organizer.remove_numbers()
-            elif mode == ProcessingMode.FILE_ORGANIZER:
-                organizer.process_files()
-            elif mode == ProcessingMode.FOLDER_MERGER:
-                organizer.merge_folders(operation=self.operation_var.get())
-            elif mode == ProcessingMode.SINGLE_FOLDER:
-                organizer.single_folder_operation(operation=self.operation_var.get())
-            else:  # FILE_COLLECTOR
-                organizer.collect_files()
+
+            organizer.run(mode, operation=self.operation_var.get())
         except Exception as e:
-            self.console.insert(tk.END, f"\n❌ Error: {str(e)}\n")
+            print(f"\n❌ Error: {str(e)}")
         finally:
-            self.is_running = False
-            self.start_button.configure(state="normal")
-            self.progress_var.set("Processing complete!")
-            sys.stdout = sys.__stdout__
+            self.root.after(0, self.finish_processing)
+
+    def toggle_profiling(self, event=None):
+        """Hidden toggle: profile the next runs with cProfile and tracemalloc"""
+        if self.profile_options:
+            self.profile_options = None
+            self.console.insert(tk.END, "🔬 Profiling disabled\n")
+        else:
+            self.profile_options = {"profile": True, "trace_malloc": True}
+            self.console.insert(tk.END, "🔬 Profiling enabled for the next runs\n")
+        self.console.see(tk.END)
+
+    def finish_processing(self):
+        """Re-enable the controls once the worker thread is done"""
+        self.is_running = False
+        self.start_button.configure(state="normal")
+        sys.stdout = sys.__stdout__
 
     def on_mode_change(self, *args):
         """Show/hide operation frame and preview frame based on selected mode"""
         # Show/hide operation frame
         if self.mode_var.get() == ProcessingMode.FOLDER_MERGER:
             self.operation_frame.grid()
+            self.merge_verify_check.grid()
         elif self.mode_var.get() == ProcessingMode.SINGLE_FOLDER:
             self.operation_frame.grid()
+            self.merge_verify_check.grid_remove()
         else:
             self.operation_frame.grid_remove()
 
-        # Show/hide preview frame
+        # Show/hide preview and library frames
         if self.mode_var.get() == ProcessingMode.FILE_ORGANIZER:
             self.preview_frame.grid()
+            self.library_frame.grid()
         else:
             self.preview_frame.grid_remove()
+            self.library_frame.grid_remove()
 
         # Show/hide destination directory selection
         if self.mode_var.get() in {
             ProcessingMode.REMOVE_NUMBER,
             ProcessingMode.DUPLICATE_FIXER,
+            ProcessingMode.PREVIEW_DEDUP,
         }:
             self.dest_var.set("")  # Clear the destination variable
             self.dest_frame.grid_remove()  # Hide the destination frame
         else:
             self.dest_frame.grid()  # Show the destination frame
 
-    def update_progress(self, current, total, status_text=None):
+    def poll_progress(self):
+        """Refresh the progress display from the bus at a fixed rate"""
+        snapshot = self.progress_bus.snapshot()
+        if snapshot["version"] != self.progress_version:
+            self.progress_version = snapshot["version"]
+            self.update_progress(snapshot)
+        self.root.after(1000 // self.progress_rate, self.poll_progress)
+
+    def update_progress(self, snapshot):
         """Update progress bar and labels"""
+        current, total = snapshot["current"], snapshot["total"]
         progress = (current / total * 100) if total > 0 else 0
         self.progress_var.set(progress)
 
-        if status_text:
-            self.progress_label.config(text=status_text)
-
-        self.file_count_label.config(text=f"Processed {current} of {total} files")
-        self.root.update_idletasks()
-
-
-class SkyFileOrganizer:
-    def __init__(
-        self,
-        source_directory=None,
-        destination_directory=None,
-        max_workers=5,
-        download_previews=True,
-    ):
-        self.source_directory = source_directory
-        self.destination_directory = destination_directory
-        self.max_workers = max_workers
-        self.models_root = None
-        self.api_url = "https://3dsky.org/api/models"
-        self.image_base_url = (
-            "https://b6.3ddd.ru/media/cache/tuk_model_custom_filter_ang_en/"
-        )
-        self.not_found_log = "not_found_models.json"
-        self.not_found_files = {}
-        self.not_found_lock = Lock()  # Lock for thread-safe dict access
-        self.print_lock = Lock()  # Lock for thread-safe printing
-        self.processing_queue = queue.Queue()
-        self.processed_count = 0  # Add counter for processed files
-        self.total_files = 0  # Add total files counter
-        self.counter_lock = Lock()  # Add lock for thread-safe counting
-        self.threads = []
-        self.download_previews = download_previews
-        self.setup_logging()
-
-    def safe_print(self, *args, **kwargs):
-        """Thread-safe printing"""
-        with self.print_lock:
-            print(*args, **kwargs)
-
-    def setup_logging(self):
-        """Setup logging configuration"""
-        logging.basicConfig(
-            filename="3dsky_organizer.log",
-            level=logging.INFO,
-            format="%(asctime)s - %(levelname)s - %(message)s",
-        )
-        self.logger = logging
-
-    def merge_folders(self, operation="move"):
-        """Merge pre-organized folders from source to destination"""
-        source_dir, dest_dir = self.get_directories()
-
-        if not os.path.exists(os.path.join(source_dir, "3ds_models")):
-            self.safe_print("❌ Source directory does not contain a 3ds_models folder")
-            return
-
-        source_models_dir = os.path.join(source_dir, "3ds_models")
-        dest_models_dir = os.path.join(dest_dir, "3ds_models")
-
-        if not os.path.exists(dest_models_dir):
-            os.makedirs(dest_models_dir)
-
-        self.safe_print(f"\n🔄 Starting folder {operation} process...")
-
-        # Count total files first
-        total_files = sum([len(files) for _, _, files in os.walk(source_models_dir)])
-        processed_count = 0
-
-        # Walk through all categories in source
-        for root, dirs, files in os.walk(source_models_dir):
-            relative_path = os.path.relpath(root, source_models_dir)
-            dest_path = os.path.join(dest_models_dir, relative_path)
-
-            # Create destination directory if it doesn't exist
-            if not os.path.exists(dest_path):
-                os.makedirs(dest_path)
-                self.safe_print(f"📁 Created directory: {relative_path}")
-
-            # First, remove any existing summary files
-            summary_path = os.path.join(root, "folder_summary.json")
-            if os.path.exists(summary_path):
-                try:
-                    os.remove(summary_path)
-                    self.safe_print(f"🗑️ Removed old summary file from: {relative_path}")
-                except Exception as e:
-                    self.safe_print(f"❌ Error removing summary file: {str(e)}")
-
-            # Move/copy all files
-            for file in files:
-                if file == "folder_summary.json":
-                    continue
-
-                processed_count += 1
-                if hasattr(self, "gui"):
-                    self.gui.root.after(
-                        0,
-                        self.gui.update_progress,
-                        processed_count,
-                        total_files,
-                        f"{operation.capitalize()}ing: {file}",
-                    )
-
-                source_file = os.path.join(root, file)
-                dest_file = os.path.join(dest_path, file)
-
-                if os.path.exists(dest_file):
-                    self.safe_print(f"⚠️ File already exists, skipping: {file}")
-                    continue
-
-                try:
-                    if operation == "move":
-                        shutil.move(source_file, dest_file)
-                    else:  # copy
-                        shutil.copy2(source_file, dest_file)
-                    self.safe_print(f"✅ {operation.capitalize()}d: {file}")
-                except Exception as e:
-                    self.safe_print(f"❌ Error {operation}ing {file}: {str(e)}")
-
-            # Update folder summary for current directory
-            self.update_folder_summary(dest_path)
-
-        # Clean up empty directories in source if moving
-        if operation == "move":
-            self.cleanup_empty_dirs(source_models_dir)
-
-        # Update all folder summaries from bottom up
-        self.update_all_folder_summaries(dest_models_dir)
-
-        # Update progress to complete
-        if hasattr(self, "gui"):
-            self.gui.root.after(
-                0,
-                self.gui.update_progress,
-                total_files,
-                total_files,
-                "Folder merge complete!",
-            )
-
-        self.safe_print(f"\n✨ Folder {operation} complete!")
-
-    def collect_files(self):
-        """Collect all zip and image files from source directory and its subdirectories"""
-        source_dir, dest_dir = self.get_directories()
-
-        if not os.path.exists(dest_dir):
-            os.makedirs(dest_dir)
-
-        self.safe_print("\n🔍 Starting file collection process...")
-
-        # Supported file extensions
-        supported_extensions = {".zip", ".rar", ".7z", ".jpg", ".jpeg", ".png"}
-
-        # First, count total files to process
-        total_files = sum(
-            1
-            for root, _, files in os.walk(source_dir)
-            for file in files
-            if os.path.splitext(file)[1].lower() in supported_extensions
-        )
-
-        processed_count = 0
-
-        # Walk through all subdirectories
-        for root, _, files in os.walk(source_dir):
-            for file in files:
-                ext = os.path.splitext(file)[1].lower()
-                if ext in supported_extensions:
-                    processed_count += 1
-                    if hasattr(self, "gui"):
-                        self.gui.root.after(
-                            0,
-                            self.gui.update_progress,
-                            processed_count,
-                            total_files,
-                            f"Collecting: {file}",
-                        )
-
-                    source_file = os.path.join(root, file)
-                    dest_file = os.path.join(dest_dir, file)
-
-                    # Handle duplicate filenames
-                    if os.path.exists(dest_file):
-                        base, ext = os.path.splitext(file)
-                        counter = 1
-                        while os.path.exists(dest_file):
-                            dest_file = os.path.join(dest_dir, f"{base}_{counter}{ext}")
-                            counter += 1
-
-                    try:
-                        shutil.copy2(source_file, dest_file)
-                        self.safe_print(f"✅ Copied: {file}")
-                    except Exception as e:
-                        self.safe_print(f"❌ Error copying {file}: {str(e)}")
-
-        # Update progress to complete
-        if hasattr(self, "gui"):
-            self.gui.root.after(
-                0,
-                self.gui.update_progress,
-                total_files,
-                total_files,
-                "File collection complete!",
-            )
-
-        self.safe_print("\n✨ File collection complete!")
-
-    def cleanup_empty_dirs(self, directory):
-        """Recursively remove empty directories"""
-        for root, dirs, files in os.walk(directory, topdown=False):
-            for dir_name in dirs:
-                dir_path = os.path.join(root, dir_name)
-                try:
-                    os.rmdir(dir_path)
-                    self.safe_print(f"🗑️ Removed empty directory: {dir_path}")
-                except OSError:
-                    # Directory not empty, skip it
-                    pass
-
-        # Try to remove the root directory itself if empty
-        try:
-            os.rmdir(directory)
-            self.safe_print(f"🗑️ Removed empty root directory: {directory}")
-        except OSError:
-            pass
-
-    def update_all_folder_summaries(self, start_path):
-        """Update folder summaries for all directories from bottom up"""
-        for root, dirs, files in os.walk(start_path, topdown=False):
-            self.update_folder_summary(root)
-
-    def process_files(self):
-        """Process all files using multiple threads"""
-        source_dir, dest_dir = self.get_directories()
-        if not os.path.exists(source_dir):
-            self.safe_print(f"❌ Error: Source directory {source_dir} does not exist")
-            self.logger.error(f"Source directory {source_dir} does not exist")
-            return
-        if not os.path.exists(dest_dir):
-            self.safe_print(
-                f"❌ Error: Destination directory {dest_dir} does not exist"
-            )
-            self.logger.error(f"Destination directory {dest_dir} does not exist")
-            return
-
-        # Get all compressed files
-        compressed_files = [
-            f
-            for f in os.listdir(source_dir)
-            if f.lower().endswith((".zip", ".rar", ".7z"))
-        ]
-
-        self.total_files = len(compressed_files)
-        self.safe_print(f"\n🔍 Found {self.total_files} compressed files to process")
-
-        # Initialize worker threads
-        for i in range(self.max_workers):
-            thread = threading.Thread(
-                target=self.worker, args=(self.total_files,), name=f"Worker-{i+1}"
-            )
-            thread.daemon = True
-            thread.start()
-            self.threads.append(thread)
-
-        # Add files to processing queue
-        for filename in compressed_files:
-            self.processing_queue.put(filename)
-
-        # Add sentinel values to signal threads to exit
-        for _ in range(self.max_workers):
-            self.processing_queue.put(None)
-
-        # Wait for all threads to complete
-        for thread in self.threads:
-            thread.join()
-
-        # Write not found files to JSON in the destination directory
-        not_found_log_path = os.path.join(self.models_root, self.not_found_log)
-        if self.not_found_files:
-            self.safe_print(
-                f"\n⚠️ Writing {len(self.not_found_files)} not found files to log"
-            )
-            with open(not_found_log_path, "w", encoding="utf-8") as f:
-                json.dump(self.not_found_files, f, indent=4)
-            self.logger.info(f"Wrote not found files to {not_found_log_path}")
-
-        # Update root directory summary
-        self.update_folder_summary(self.models_root)
-        self.safe_print("\n✨ Processing complete!")
-
-    def worker(self, total_files):
-        """Worker thread to process files"""
-        while True:
-            filename = self.processing_queue.get()
-            if filename is None:  # Check for sentinel value
-                self.processing_queue.task_done()
-                break
-
-            try:
-                with self.counter_lock:
-                    self.processed_count += 1
-                    current_count = self.processed_count
-
-                # Update progress in GUI
-                if hasattr(self, "gui"):
-                    self.gui.root.after(
-                        0,
-                        self.gui.update_progress,
-                        current_count,
-                        total_files,
-                        f"Processing: {filename}",
-                    )
-
-                self.safe_print(
-                    f"\n📦 Processing file {current_count}/{total_files}: {filename}"
-                )
-                self.process_single_file(filename)
-            except Exception as e:
-                self.safe_print(f"❌ Error processing {filename}: {str(e)}")
-                self.logger.error(f"Error processing {filename}: {str(e)}")
-            finally:
-                self.processing_queue.task_done()
-                time.sleep(1)
-
-    def process_single_file(self, filename):
-        """Process a single file"""
-        file_id = self.extract_file_id(filename)
-        if not file_id:
-            self.safe_print(f"⚠️ Invalid filename format: {filename}")
-            self.logger.warning(f"Invalid filename format: {filename}")
-            with self.not_found_lock:
-                self.not_found_files[filename] = "Invalid filename format"
-            return
-
-        # Get model details from API
-        details = self.get_model_details(file_id)
-        if not details:
-            return
-
-        # Log successful find
-        self.logger.info(f"Found model: {details['title']} for file: {filename}")
-
-        # Create folder structure
-        destination_folder = self.create_folder_structure(details["categories"])
-
-        # First move all related files (zip and images) to destination
-        self.safe_print(f"📦 Moving files to: {os.path.basename(destination_folder)}")
-
-        # Move the compressed file first
-        source_path = os.path.join(self.source_directory, filename)
-        dest_path = os.path.join(destination_folder, filename)
-
-        try:
-            shutil.move(source_path, dest_path)
-            self.safe_print("✅ Compressed file moved successfully")
-            self.logger.info(f"Moved file to: {dest_path}")
-        except Exception as e:
-            self.safe_print(f"❌ Error moving compressed file: {str(e)}")
-            self.logger.error(f"Error moving file {filename}: {str(e)}")
-            return
-
-        # Now attempt to download new image only if enabled
-        if self.download_previews:
-            image_path = os.path.join(destination_folder, f"{file_id}.jpeg")
-            download_success = self.download_image(details["image_url"], image_path)
-
-            if download_success:
-                # Compare and keep only the best quality image
-                self.handle_duplicate_images(destination_folder, file_id, image_path)
-            else:
-                self.safe_print(
-                    "⚠️ Using existing images (if any) due to download failure"
-                )
-        else:
-            # Just move existing images without downloading new ones
-            self.move_related_images(self.source_directory, destination_folder, file_id)
-
-        # Update folder summary after all files are in place
-        self.update_folder_summary(destination_folder)
-
-    def handle_duplicate_images(self, folder, file_id, new_image_path):
-        """Compare and keep only the larger size image"""
-        try:
-            new_image = Image.open(new_image_path)
-            new_image_size = os.path.getsize(new_image_path)
-            new_image_resolution = new_image.size[0] * new_image.size[1]
-            new_image.close()
-
-            model_number = file_id.split(".")[0]
-            existing_images = []
-
-            # Collect information about existing images
-            for filename in os.listdir(folder):
-                if (
-                    filename.lower().endswith((".jpg", ".jpeg", ".png"))
-                    and filename.startswith(model_number)
-                    and os.path.join(folder, filename) != new_image_path
-                ):
-                    try:
-                        img_path = os.path.join(folder, filename)
-                        img = Image.open(img_path)
-                        resolution = img.size[0] * img.size[1]
-                        size = os.path.getsize(img_path)
-                        img.close()
-                        existing_images.append(
-                            {"path": img_path, "resolution": resolution, "size": size}
-                        )
-                    except Exception as e:
-                        self.safe_print(
-                            f"⚠️ Error processing image {filename}: {str(e)}"
-                        )
-
-            # Keep only the best quality image
-            if existing_images:
-                # Compare based on resolution first, then file size
-                best_existing = max(
-                    existing_images, key=lambda x: (x["resolution"], x["size"])
-                )
-
-                if best_existing["resolution"] > new_image_resolution or (
-                    best_existing["resolution"] == new_image_resolution
-                    and best_existing["size"] > new_image_size
-                ):
-                    # Existing image is better, remove the new one
-                    os.remove(new_image_path)
-                    self.safe_print("📸 Kept existing higher quality image")
-                else:
-                    # New image is better, remove all existing ones
-                    for img in existing_images:
-                        os.remove(img["path"])
-                    self.safe_print("📸 Replaced with higher quality downloaded image")
-            else:
-                self.safe_print("📸 Kept newly downloaded image (no existing images)")
-
-        except Exception as e:
-            self.safe_print(f"⚠️ Error comparing images: {str(e)}")
-
-    def remove_existing_images(self, folder, file_id):
-        """Remove existing images if new download is successful"""
-        image_extensions = [".jpg", ".jpeg", ".png"]
-        model_number = file_id.split(".")[0]
-        removed_count = 0
-
-        for filename in os.listdir(folder):
-            file_base, ext = os.path.splitext(filename)
-            if (
-                ext.lower() in image_extensions
-                and file_base.startswith(model_number)
-                and filename != f"{file_id}.jpeg"
-            ):  # Don't remove the newly downloaded image
-                try:
-                    os.remove(os.path.join(folder, filename))
-                    removed_count += 1
-                    self.logger.info(f"Removed existing image: {filename}")
-                except Exception as e:
-                    self.logger.error(
-                        f"Error removing existing image {filename}: {str(e)}"
-                    )
-
-        if removed_count > 0:
-            print(f"🗑️ Removed {removed_count} older images")
-
-    def get_directories(self):
-        """Get source and destination directories if not provided"""
-        if not self.source_directory:
-            self.source_directory = input(
-                "Please enter the source directory path containing the files: "
-            ).strip()
-            print(f"Source directory set to: {self.source_directory}")
-
-        if not self.destination_directory:
-            self.destination_directory = input(
-                "Please enter the destination directory path: "
-            ).strip()
-            print(f"Destination directory set to: {self.destination_directory}")
-
-        # Create 3ds_models folder in destination
-        self.models_root = os.path.join(self.destination_directory, "3ds_models")
-        if not os.path.exists(self.models_root):
-            os.makedirs(self.models_root)
-            print(f"Created 3ds_models directory at: {self.models_root}")
-            self.logger.info(f"Created 3ds_models directory at: {self.models_root}")
-
-        return self.source_directory, self.destination_directory
-
-    def extract_file_id(self, filename):
-        """Extract the file ID from filename"""
-        base_name = os.path.splitext(filename)[0]
-        if re.match(r"^\d+\.[a-f0-9]+$", base_name):
-            return base_name
-        return None
-
-    def get_model_details(self, file_id):
-        """Get model details from 3dsky.org API"""
-        print(f"\nFetching details for model ID: {file_id}")
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "Content-Type": "application/json",
-        }
-        payload = {"query": file_id, "order": "relevance"}
-
-        try:
-            print("Making API request...")
-            response = requests.post(self.api_url, json=payload, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-
-            if not data.get("data", {}).get("models"):
-                print(f"❌ No models found for ID: {file_id}")
-                self.logger.error(
-                    f"No models found in API response for file_id: {file_id}"
-                )
-                self.not_found_files[file_id] = "No models found in API response"
-                return None
-
-            model = data["data"]["models"][0]
-            print(f"✅ Found model: {model.get('title_en', 'Untitled')}")
-
-            # Get category information
-            categories = []
-            if model.get("category_parent"):
-                categories.append(model["category_parent"]["title_en"])
-            if model.get("category"):
-                categories.append(model["category"]["title_en"])
-
-            if not categories:
-                print(f"❌ No categories found for model: {file_id}")
-                self.logger.error(f"No categories found for model: {file_id}")
-                self.not_found_files[file_id] = "No categories found"
-                return None
-
-            # Find matching image
-            image_path = None
-            for image in model.get("images", []):
-                if image.get("file_name", "").startswith(file_id.split(".")[0]):
-                    image_path = image.get("web_path")
-                    break
-
-            if not image_path:
-                print(f"⚠️ No matching image found for model: {file_id}")
-                self.logger.error(f"No matching image found for model: {file_id}")
-                return None
-
-            image_url = f"{self.image_base_url}{image_path}"
-
-            return {
-                "categories": categories,
-                "image_url": image_url,
-                "title": model.get("title_en"),
-            }
-
-        except Exception as e:
-            print(f"❌ Error getting details for {file_id}: {str(e)}")
-            self.logger.error(f"Error getting details for {file_id}: {str(e)}")
-            self.not_found_files[file_id] = str(e)
-            return None
-
-    def create_folder_structure(self, categories):
-        """Create folder structure based on categories"""
-        current_path = self.models_root  # Start from 3ds_models folder
-        for category in categories:
-            # Clean category name for folder creation
-            clean_category = re.sub(r'[<>:"/\\|?*]', "", category)
-            current_path = os.path.join(current_path, clean_category)
-            if not os.path.exists(current_path):
-                os.makedirs(current_path)
-                print(f"📁 Created category folder: {clean_category}")
-        return current_path
-
-    def download_image(self, image_url, destination):
-        """Download image from URL with proper error handling and timeout"""
-        print("📥 Downloading preview image...")
-        try:
-            # Set a timeout for the request
-            response = requests.get(image_url, stream=True, timeout=30)
-            response.raise_for_status()
-
-            with open(destination, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            print("✅ Image downloaded successfully")
-            return True
-        except requests.exceptions.Timeout:
-            print("⚠️ Download timed out")
-            self.logger.error(f"Timeout downloading image {image_url}")
-            return False
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Error downloading image: {str(e)}")
-            self.logger.error(f"Error downloading image {image_url}: {str(e)}")
-            return False
-        except Exception as e:
-            print(f"❌ Unexpected error while downloading image: {str(e)}")
-            self.logger.error(
-                f"Unexpected error downloading image {image_url}: {str(e)}"
-            )
-            return False
-
-    def update_folder_summary(self, folder_path):
-        """Update folder summary JSON file with accurate subfolder counting"""
-        print(f"\nUpdating folder summary for: {folder_path}")
-        summary = {
-            "total_files": 0,
-            "total_subfolders": 0,
-            "file_types": {},
-            "last_updated": time.strftime("%Y-%m-%d %H:%M:%S"),
-        }
-
-        # Get immediate subfolders
-        immediate_subfolders = [
-            d
-            for d in os.listdir(folder_path)
-            if os.path.isdir(os.path.join(folder_path, d))
-        ]
-        summary["total_subfolders"] = len(immediate_subfolders)
-
-        # Count files only in current directory
-        for item in os.listdir(folder_path):
-            item_path = os.path.join(folder_path, item)
-            if os.path.isfile(item_path) and item != "folder_summary.json":
-                summary["total_files"] += 1
-                ext = os.path.splitext(item)[1].lower()
-                summary["file_types"][ext] = summary["file_types"].get(ext, 0) + 1
-
-        # Write summary to JSON file
-        summary_path = os.path.join(folder_path, "folder_summary.json")
-        with open(summary_path, "w", encoding="utf-8") as f:
-            json.dump(summary, f, indent=4)
-
-        print(
-            f"📊 Summary updated for {os.path.basename(folder_path)}: "
-            f"{summary['total_files']} files, "
-            f"{summary['total_subfolders']} immediate subfolders"
-        )
-        return summary
-
-    def move_related_images(self, source_dir, dest_dir, model_id):
-        """Move any related image files to destination directory"""
-        print("🔍 Looking for related images...")
-        image_extensions = [".jpg", ".jpeg", ".png"]
-        model_number = model_id.split(".")[0]
-        moved_count = 0
-
-        # Get list of files to move before starting moves
-        files_to_move = []
-        for filename in os.listdir(source_dir):
-            file_base, ext = os.path.splitext(filename)
-            if ext.lower() in image_extensions and file_base.startswith(model_number):
-                files_to_move.append(filename)
-
-        # Move files with proper error handling
-        for filename in files_to_move:
-            source_path = os.path.join(source_dir, filename)
-            dest_path = os.path.join(dest_dir, filename)
-            try:
-                shutil.move(source_path, dest_path)
-                moved_count += 1
-                self.logger.info(f"Moved related image: {filename} to {dest_dir}")
-            except Exception as e:
-                print(f"❌ Error moving image {filename}: {str(e)}")
-                self.logger.error(f"Error moving related image {filename}: {str(e)}")
-
-        if moved_count > 0:
-            print(f"✅ Moved {moved_count} related images")
-        else:
-            print("ℹ️ No related images found")
-
-    def fix_duplicates(self):
-        """Fix duplicate files in the source directory"""
-        if not self.source_directory:
-            self.safe_print("❌ Source directory not specified")
-            return
+        if snapshot["status"]:
+            self.progress_label.config(text=snapshot["status"])
 
-        self.safe_print("\n🔍 Scanning for duplicate files...")
+        self.file_count_label.config(text=describe(snapshot))
 
-        # Dictionary to store file groups (with extensions) and their variants
-        file_groups = {}
 
-        # First pass: Group files
-        for root, _, files in os.walk(self.source_directory):
-            for filename in files:
-                # Remove numbers in parentheses for comparison but keep the extension
-                base_name = re.sub(r"\s*\(\d+\)\s*", "", filename).strip()
-                print(f"Base Name {base_name}, File Name {filename}")
-                file_path = os.path.join(root, filename)
-                if base_name not in file_groups:
-                    file_groups[base_name] = []
-                file_groups[base_name].append(file_path)
-
-        # Filter only groups with duplicates
-        duplicate_groups = {k: v for k, v in file_groups.items() if len(v) > 1}
-
-        if not duplicate_groups:
-            self.safe_print("✨ No duplicate files found!")
-            return
-
-        total_groups = len(duplicate_groups)
-        self.safe_print(f"\n📊 Found {total_groups} files with duplicates")
-
-        processed_count = 0
-        for base_name, file_paths in duplicate_groups.items():
-            processed_count += 1
-
-            duplicate_folder = os.path.join(self.source_directory, "Duplicates")
-            if not os.path.exists(duplicate_folder):
-                os.makedirs(duplicate_folder)
-
-            if hasattr(self, "gui"):
-                self.gui.update_progress(
-                    processed_count, total_groups, f"Processing: {base_name}"
-                )
-
-            self.safe_print(f"\n📦 Processing duplicates for: {base_name}")
-
-            # Get file sizes
-            file_sizes = [(path, os.path.getsize(path)) for path in file_paths]
-
-            # Sort by size (largest first)
-            file_sizes.sort(key=lambda x: x[1], reverse=True)
-
-            # If all files have the same size, keep the one without numbers
-            if all(size == file_sizes[0][1] for _, size in file_sizes):
-                # Try to find a file without numbers in parentheses
-                clean_name_file = next(
-                    (
-                        path
-                        for path in file_paths
-                        if not re.search(r"\(\d+\)", os.path.basename(path))
-                    ),
-                    file_sizes[0][0],  # If none found, use the first file
-                )
-                files_to_keep = [clean_name_file]
-            else:
-                # Keep the largest file
-                files_to_keep = [file_sizes[0][0]]
-
-            # Move all other files to a subfolder
-            for file_path, size in file_sizes:
-                if file_path not in files_to_keep:
-                    try:
-                        shutil.move(file_path, duplicate_folder)
-                        self.safe_print(f"🗑️ Moved: {os.path.basename(file_path)}")
-                    except Exception as e:
-                        self.safe_print(
-                            f"❌ Error Moving {os.path.basename(file_path)}: {str(e)}"
-                        )
-
-            # Rename the kept file if it has numbers in parentheses
-            kept_file = files_to_keep[0]
-            kept_filename = os.path.basename(kept_file)
-            if re.search(r"\(\d+\)", kept_filename):
-                # new_filename = re.sub(
-                #     r"\s*\(\d+\)\s*$", "", kept_filename
-                # )  # Remove numbers in parentheses
-                new_path = os.path.join(
-                    os.path.dirname(kept_file), base_name
-                )  # base name should be without number we are processing this above
-                try:
-                    os.rename(kept_file, new_path)
-                    self.safe_print(f"✅ Renamed to: {base_name}")
-                except Exception as e:
-                    self.safe_print(f"❌ Error renaming {kept_filename}: {str(e)}")
-
-        self.safe_print("\n✨ Duplicate fixing complete! Now Run Remove Number")
-
-    def single_folder_operation(self, operation="move"):
-        """Move or copy all files from source directory to a single destination folder"""
-        source_dir, dest_dir = self.get_directories()
-
-        if not os.path.exists(dest_dir):
-            os.makedirs(dest_dir)
-
-        self.safe_print("\n🔍 Starting single folder operation...")
-
-        # Walk through all files in the source directory
-        for root, _, files in os.walk(source_dir):
-            for file in files:
-                source_file = os.path.join(root, file)
-                dest_file = os.path.join(dest_dir, file)
-
-                # Handle duplicate filenames
-                if os.path.exists(dest_file):
-                    base, ext = os.path.splitext(file)
-                    counter = 1
-                    while os.path.exists(dest_file):
-                        dest_file = os.path.join(dest_dir, f"{base}_{counter}{ext}")
-                        counter += 1
-
-                try:
-                    if operation == "move":
-                        shutil.move(source_file, dest_file)
-                        self.safe_print(f"✅ Moved: {file}")
-                    else:  # copy
-                        shutil.copy2(source_file, dest_file)
-                        self.safe_print(f"✅ Copied: {file}")
-                except Exception as e:
-                    self.safe_print(f"❌ Error {operation}ing {file}: {str(e)}")
-
-        self.safe_print("\n✨ Single folder operation complete!")
-
-    def remove_numbers(self):
-        """Remove any (number) part from file names in the source directory"""
-        if not self.source_directory:
-            self.safe_print("❌ Source directory not specified")
-            return
-
-        self.safe_print("\n🔍 Starting number removal process...")
-
-        for root, _, files in os.walk(self.source_directory):
-            for filename in files:
-
-                if hasattr(self, "gui"):
-                    self.gui.update_progress(0, 0, f"Processing: {filename}")
-
-                new_filename = re.sub(
-                    r"\s*\(\d+\)\s*", "", filename
-                )  # Remove (number) parts
-                if new_filename != filename:  # Only rename if there's a change
-                    old_file_path = os.path.join(root, filename)
-                    new_file_path = os.path.join(root, new_filename)
-                    if os.path.exists(
-                        new_file_path
-                    ):  # Check if the new filename already exists
-                        self.safe_print(f"⚠️ File already exists: {new_filename}")
-                    else:
-                        try:
-                            os.rename(old_file_path, new_file_path)
-                            self.safe_print(f"✅ Renamed: {filename} to {new_filename}")
-                        except Exception as e:
-                            self.safe_print(f"❌ Error renaming {filename}: {str(e)}")
-
-        self.safe_print("\n✨ Number removal complete!")
+def main():
+    if getattr(sys, "frozen", False):
+        import multiprocessing
 
+        # Preview optimization workers re-launch the executable
+        multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="3DSky File Organizer")
+    add_profiling_arguments(parser)
+    args = parser.parse_args()
 
-def main():
     root = tk.Tk()
     app = SkyFileOrganizerGUI(root)
+    app.profile_options = profile_options_from_args(args)
+    # Used by benchmark.py --startup to time the first window
+    if os.environ.get("SKY_ORGANIZER_EXIT_AFTER_STARTUP"):
+        root.after_idle(root.destroy)
     root.mainloop()
 
 
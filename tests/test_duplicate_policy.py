@@ -0,0 +1,72 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from bench_fixtures import FakeSkyServer, make_archive, model_id
+from sky_organizer import (
+    DuplicatePolicy,
+    OrganizerOptions,
+    ProcessingMode,
+    SkyFileOrganizer,
+)
+
+
+class OrganizeAgainTest(unittest.TestCase):
+    """DuplicatePolicy.PROCESS files an ID that is already in the library again"""
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp(prefix="3dsky_test_")
+        self.source = os.path.join(self.workspace, "source")
+        self.destination = os.path.join(self.workspace, "library")
+        os.makedirs(self.source)
+        os.makedirs(self.destination)
+        self.server = FakeSkyServer().start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def organize(self, filename, size):
+        make_archive(os.path.join(self.source, filename), size, random.Random(size))
+        organizer = SkyFileOrganizer(
+            self.source,
+            self.destination,
+            OrganizerOptions(
+                max_workers=1,
+                download_previews=False,
+                duplicate_policy=DuplicatePolicy.PROCESS,
+                api_delay=0,
+            ),
+        )
+        organizer.api_url = f"{self.server.base_url}/api/models"
+        organizer.image_base_url = f"{self.server.base_url}/media/"
+        with open(os.devnull, "w", encoding="utf-8") as devnull:
+            with redirect_stdout(devnull):
+                organizer.run(ProcessingMode.FILE_ORGANIZER)
+        return organizer
+
+    def library_copies(self, filename):
+        models_root = os.path.join(self.destination, "3ds_models")
+        return [
+            os.path.join(root, filename)
+            for root, _, files in os.walk(models_root)
+            if filename in files
+        ]
+
+    def test_same_id_twice_replaces_library_copy(self):
+        filename = f"{model_id(100001)}.zip"
+        self.organize(filename, 1024)
+        organizer = self.organize(filename, 4096)
+
+        self.assertEqual(os.listdir(self.source), [])
+        copies = self.library_copies(filename)
+        self.assertEqual(len(copies), 1)
+        self.assertGreater(os.path.getsize(copies[0]), 4096)
+        self.assertEqual(organizer.failure_log.count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
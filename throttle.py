@@ -0,0 +1,160 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RateLimiter:
+    """Token bucket shared by all workers, refilled at `rate` tokens per second"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens are available, returns the time waited"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                # Requests larger than the bucket go through once it is full
+                needed = min(amount, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return waited
+                delay = (needed - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class DownloadBudget:
+    """Per-host connection limits and a shared bytes/sec budget for downloads
+
+    Requests hold a slot of their host while they run. Downloaded chunks are
+    charged to a token bucket, optionally only during throttle_hours, e.g.
+    (8, 20) to throttle during the day and run at full speed overnight.
+    """
+
+    def __init__(self, bytes_per_sec=None, host_limits=None, throttle_hours=None):
+        self.bytes_per_sec = bytes_per_sec
+        self.limiter = (
+            RateLimiter(bytes_per_sec, burst=bytes_per_sec) if bytes_per_sec else None
+        )
+        self.throttle_hours = throttle_hours
+        self.semaphores = {
+            host: threading.BoundedSemaphore(limit)
+            for host, limit in (host_limits or {}).items()
+            if limit
+        }
+        self.lock = threading.Lock()
+        self.active = {}  # host -> running requests
+        self.transferred = 0
+
+    @staticmethod
+    def host_of(url):
+        from urllib.parse import urlsplit
+
+        return urlsplit(url).hostname or ""
+
+    @contextmanager
+    def slot(self, url):
+        """Hold a connection slot of the URL's host while the request runs"""
+        host = self.host_of(url)
+        semaphore = self.semaphores.get(host)
+        if semaphore is not None:
+            semaphore.acquire()
+        with self.lock:
+            self.active[host] = self.active.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.active[host] -= 1
+            if semaphore is not None:
+                semaphore.release()
+
+    def current_rate(self):
+        """Bytes per second allowed right now, None when unthrottled"""
+        if self.limiter is None:
+            return None
+        if self.throttle_hours:
+            start, end = self.throttle_hours
+            hour = time.localtime().tm_hour
+            inside = (
+                start <= hour < end if start <= end else hour >= start or hour < end
+            )
+            if not inside:
+                return None
+        return self.bytes_per_sec
+
+    def consume(self, nbytes):
+        """Charge downloaded bytes, blocking while the budget is exhausted"""
+        with self.lock:
+            self.transferred += nbytes
+        if self.current_rate() is not None:
+            self.limiter.acquire(nbytes)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "transferred": self.transferred,
+                "active": {h: n for h, n in self.active.items() if n},
+                "limit": self.current_rate(),
+            }
+
+
+def parse_hours(text):
+    """Parse "8-20" into (8, 20)"""
+    start, _, end = text.partition("-")
+    hours = (int(start), int(end))
+    if not all(0 <= h <= 24 for h in hours):
+        raise ValueError(f"Invalid hours: {text}")
+    return hours
+
+
+def add_bandwidth_arguments(parser):
+    """Add the shared download budget flags to an argparse parser"""
+    group = parser.add_argument_group("download budget")
+    group.add_argument(
+        "--download-rate",
+        type=float,
+        metavar="MB_PER_SEC",
+        help="Maximum preview download rate across all workers",
+    )
+    group.add_argument(
+        "--throttle-hours",
+        type=parse_hours,
+        metavar="START-END",
+        help="Only apply --download-rate between these hours, e.g. 8-20",
+    )
+    group.add_argument(
+        "--api-connections",
+        type=int,
+        metavar="N",
+        help="Maximum concurrent requests to the 3dsky API",
+    )
+    group.add_argument(
+        "--cdn-connections",
+        type=int,
+        metavar="N",
+        help="Maximum concurrent preview downloads from the image CDN",
+    )
+
+
+def bandwidth_options_from_args(args):
+    """Build SkyFileOrganizer bandwidth_options from parsed arguments"""
+    return {
+        "bytes_per_sec": (
+            args.download_rate * 1024 * 1024 if args.download_rate else None
+        ),
+        "throttle_hours": args.throttle_hours,
+        "api_connections": args.api_connections,
+        "cdn_connections": args.cdn_connections,
+    }
@@ -0,0 +1,218 @@
+import os
+import select
+import struct
+import sys
+import time
+
+from library_index import ARCHIVE_EXTENSIONS
+
+
+class InotifyBackend:
+    """Linux inotify through ctypes, reports files once they are closed or renamed in"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_DELETE = 0x00000200
+    FINISHED = IN_CLOSE_WRITE | IN_MOVED_TO
+    REMOVED = IN_MOVED_FROM | IN_DELETE
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, directories):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), self.FINISHED | self.REMOVED
+            )
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+            self.watches[wd] = directory
+
+    def read(self, timeout):
+        """(path, finished) of files finished or removed within timeout seconds
+
+        finished is False for files deleted or renamed out of the folder.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if wd in self.watches and name:
+                path = os.path.join(self.watches[wd], os.fsdecode(name))
+                events.append((path, bool(mask & self.FINISHED)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """Report archives dropped into watched folders once they are fully written
+
+    inotify is used on Linux when available. Elsewhere, and on network shares
+    where inotify sees no remote writes, folders are polled: a folder is only
+    listed when its mtime changed, and a file is ready once its size and mtime
+    have been stable for settle_seconds.
+    """
+
+    def __init__(
+        self, directories, settle_seconds=5, poll_interval=2, use_inotify=True
+    ):
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.backend = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self.backend = InotifyBackend(self.directories)
+            except OSError:
+                self.backend = None
+        self.pending = {}  # path -> (size, mtime_ns, stable since)
+        self.handed_out = {}  # path -> (size, mtime_ns) already reported
+        self.folder_mtimes = {}
+        self.next_poll = 0
+
+    @property
+    def mode(self):
+        return "inotify" if self.backend else "polling"
+
+    def _is_archive(self, path):
+        return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+    def _scan(self, force=False):
+        """List folders whose mtime changed and track new or changed archives"""
+        for directory in self.directories:
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            if not force and self.folder_mtimes.get(directory) == mtime:
+                continue
+            self.folder_mtimes[directory] = mtime
+            present = set()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if not self._is_archive(entry.name) or not entry.is_file():
+                            continue
+                        present.add(entry.path)
+                        stat = entry.stat()
+                        state = (stat.st_size, stat.st_mtime_ns)
+                        if self.handed_out.get(entry.path) == state:
+                            continue
+                        if entry.path not in self.pending:
+                            self.pending[entry.path] = (*state, time.monotonic())
+            except OSError:
+                continue
+            # Forget files that left the folder
+            for path in list(self.handed_out):
+                if os.path.dirname(path) == directory and path not in present:
+                    self._forget(path)
+
+    def _forget(self, path):
+        """Drop a file that was deleted or moved away, organized ones included"""
+        self.handed_out.pop(path, None)
+        self.pending.pop(path, None)
+
+    def _settled(self):
+        """Pending files whose size and mtime stopped changing"""
+        now = time.monotonic()
+        ready = []
+        for path, (size, mtime_ns, since) in list(self.pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self.pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif now - since >= self.settle_seconds:
+                ready.append(path)
+        return ready
+
+    def _hand_out(self, paths):
+        ready = []
+        for path in paths:
+            self.pending.pop(path, None)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            state = (stat.st_size, stat.st_mtime_ns)
+            if self.handed_out.get(path) != state:
+                self.handed_out[path] = state
+                ready.append(path)
+        return ready
+
+    def initial(self):
+        """Archives already in the folders when watching starts
+
+        They go through the same settle check as polled files, counting the
+        time since their last modification, so a copy still in progress is
+        handed out by a later wait() once complete.
+        """
+        self._scan(force=True)
+        # Wall clock mtimes converted to the monotonic clock of `since`
+        offset = time.time() - time.monotonic()
+        for path, (size, mtime_ns, since) in self.pending.items():
+            modified = mtime_ns / 1e9 - offset
+            self.pending[path] = (size, mtime_ns, min(since, modified))
+        return self._hand_out(self._settled())
+
+    def wait(self, timeout):
+        """Block up to timeout seconds, returns archives ready to be organized"""
+        deadline = time.monotonic() + timeout
+        ready = []
+        while not ready:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if self.backend:
+                # close_write and moved_to only fire once a file is complete,
+                # files found by initial() still settle like polled ones
+                timeout = (
+                    min(remaining, self.poll_interval) if self.pending else remaining
+                )
+                paths = []
+                for path, finished in self.backend.read(timeout):
+                    if not self._is_archive(path):
+                        continue
+                    if finished:
+                        paths.append(path)
+                    else:
+                        # Most often an archive the organizer just moved away
+                        self._forget(path)
+                        if path in paths:
+                            paths.remove(path)
+                if self.pending:
+                    paths += self._settled()
+                ready = self._hand_out(paths)
+            else:
+                time.sleep(min(remaining, max(0, self.next_poll - time.monotonic())))
+                self.next_poll = time.monotonic() + self.poll_interval
+                self._scan()
+                ready = self._hand_out(self._settled())
+        return ready
+
+    def close(self):
+        if self.backend:
+            self.backend.close()
+            self.backend = None
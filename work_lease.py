@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+
+from library_state import state_path
+
+
+class LeaseDirectory:
+    """Claims on source files shared by organizer processes through lease files
+
+    Every process working on the same shard creates `<file>.lease` with
+    O_EXCL in a shared folder under 3ds_models, so only one of them organizes
+    each file. Held leases are touched by a heartbeat thread; a lease whose
+    mtime is older than ttl belongs to a dead worker and may be taken over.
+    Finished files leave a `<file>.done` marker holding the source size and
+    mtime, so files left in the source (not found, skipped) aren't redone by
+    the other processes.
+    """
+
+    dir_name = "leases"
+
+    def __init__(self, models_root, shard, ttl=120, worker_id=None):
+        self.shard_dir = state_path(models_root, self.dir_name, shard)
+        self.ttl = ttl
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.held = {}  # key -> (lease path, source size, source mtime_ns)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.heartbeat = None
+
+    def start(self, keep_days=7):
+        """Create the shard folder, drop old shards and start the heartbeat"""
+        os.makedirs(self.shard_dir, exist_ok=True)
+        parent = os.path.dirname(self.shard_dir)
+        cutoff = time.time() - keep_days * 24 * 3600
+        for name in os.listdir(parent):
+            path = os.path.join(parent, name)
+            try:
+                if path != self.shard_dir and os.stat(path).st_mtime < cutoff:
+                    shutil.rmtree(path)
+            except OSError:
+                continue
+        self.heartbeat = threading.Thread(
+            target=self._renew, name="LeaseHeartbeat", daemon=True
+        )
+        self.heartbeat.start()
+        return self
+
+    def _paths(self, key):
+        base = os.path.join(self.shard_dir, key)
+        return base + ".lease", base + ".done"
+
+    def claim(self, key, source_path):
+        """Take the lease of a source file, False if another worker has or did it"""
+        lease_path, done_path = self._paths(key)
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return False  # Already moved by another worker
+        state = [stat.st_size, stat.st_mtime_ns]
+        try:
+            with open(done_path, "r", encoding="utf-8") as f:
+                if json.load(f).get("source") == state:
+                    return False
+        except (OSError, ValueError):
+            pass
+
+        for _ in range(2):
+            try:
+                fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._take_over(lease_path):
+                    return False
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"worker": self.worker_id, "time": time.time()}, f)
+            # The file may have been finished between the listing and the claim
+            if not os.path.exists(source_path):
+                os.remove(lease_path)
+                return False
+            with self.lock:
+                self.held[key] = (lease_path, *state)
+            return True
+        return False
+
+    def _take_over(self, lease_path):
+        """Remove an expired lease, returns True if the claim should be retried"""
+        try:
+            if time.time() - os.stat(lease_path).st_mtime < self.ttl:
+                return False
+        except FileNotFoundError:
+            return True  # Released meanwhile
+        except OSError:
+            return False
+        # Renaming is atomic, so only one worker takes over a dead lease
+        stale_path = f"{lease_path}.{self.worker_id}.stale"
+        try:
+            os.rename(lease_path, stale_path)
+        except OSError:
+            return False
+        try:
+            if time.time() - os.stat(stale_path).st_mtime < self.ttl:
+                # Another worker renewed or replaced it after our check, put it back
+                try:
+                    os.link(stale_path, lease_path)
+                except OSError:
+                    pass
+                return False
+        finally:
+            os.remove(stale_path)
+        return True
+
+    def release(self, key, done=True):
+        """Give up a lease, leaving a done marker when the file was handled"""
+        with self.lock:
+            held = self.held.pop(key, None)
+        if held is None:
+            return
+        lease_path, size, mtime_ns = held
+        _, done_path = self._paths(key)
+        try:
+            if done:
+                with open(lease_path, "w", encoding="utf-8") as f:
+                    json.dump({"worker": self.worker_id, "source": [size, mtime_ns]}, f)
+                os.replace(lease_path, done_path)
+            else:
+                os.remove(lease_path)
+        except OSError:
+            pass
+
+    def _renew(self):
+        while not self.stop_event.wait(self.ttl / 3):
+            with self.lock:
+                paths = [held[0] for held in self.held.values()]
+            for path in paths:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+
+    def close(self):
+        """Stop the heartbeat and drop leases of files that were never finished"""
+        self.stop_event.set()
+        if self.heartbeat is not None:
+            self.heartbeat.join()
+            self.heartbeat = None
+        with self.lock:
+            keys = list(self.held)
+        for key in keys:
+            self.release(key, done=False)